@@ -0,0 +1,163 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import matrix_api as api
+import matrix_export
+import profiling
+from matrix_cache import ResponseCache
+from traceability import TraceIndex
+from item_table import ItemTable
+
+# Manifest example:
+# {
+#     "workers": 8,
+#     "projects": [
+#         {"project": "QMS", "url": "https://example.matrixreq.com/rest/1", "trace": "out/qms",
+#          "exports": [
+#              {"folder": "F-PREQ-16", "title": "Implant Software", "output": "out/preq"},
+#              {"folder": "F-FMEA-2", "output": "out/fmea", "formats": ["xlsx", "csv"]}
+#          ]}
+#     ]
+# }
+# url and token default to config.json / MATRIX_* variables, an export may also set "virtual" and "path".
+# "trace" indexes the SRS/SDD references of all the exports of the project, written once they are all done.
+
+
+def load_batch(path):
+    with open(path, "r", encoding="utf-8") as f:
+        batch = json.load(f)
+    for project in batch.get("projects", []):
+        if "project" not in project:
+            raise ValueError(f"{path}: every project needs a \"project\" name")
+        for export in project.get("exports", []):
+            if "folder" not in export or "output" not in export:
+                raise ValueError(f"{path}: every export of {project['project']} needs a \"folder\" and an \"output\"")
+            if "trace" in export:
+                raise ValueError(f"{path}: \"trace\" is set on the project ({project['project']}), not on an export")
+            for name in export.get("formats", ["xlsx"]):
+                if name not in matrix_export.WRITERS:
+                    raise ValueError(f"{path}: unknown format '{name}', expected one of: " + ", ".join(matrix_export.WRITERS))
+    return batch
+
+
+def find_folder(json_in, folder_id):
+    # Sub-tree of an already fetched folder tree, None if folder_id is not in it
+    for line in json_in:
+        if line['isFolder'] == 1:
+            if line['itemRef'] == folder_id:
+                return line
+            found = find_folder(line.get('itemList', []), folder_id)
+            if found is not None:
+                return found
+    return None
+
+
+def crawl_project(project, workers, executor, timings):
+    """
+    Export every folder of one project. Folder trees are fetched once (a folder nested in an
+    already fetched one is taken out of it) and an item shared by several exports is fetched once.
+    Writing is handed to the executor, the crawl of the next folder goes on meanwhile.
+    With a project "trace", one TraceIndex gathers the references of all its exports.
+    """
+    trees = {}  # folder ID -> (tree, whether its items carry their field values)
+    seen = {}   # item ID -> {"version", "row"}, shared by all exports of the project
+    futures = []
+    trace = (TraceIndex(), threading.Lock()) if project.get("trace") else None
+    for export in project.get("exports", []):
+        folder_id = export["folder"]
+        start = time.perf_counter()
+        tree, bulk = next(((found, bulk) for found, bulk in ((find_folder(t['itemList'], folder_id), bulk)
+                                                            for t, bulk in trees.values())
+                           if found is not None), (None, True))
+        if tree is None:
+            tree, bulk = api.getFolderTree(folder_id)
+            if tree is None:
+                continue
+            trees[folder_id] = (tree, bulk)
+        lines = api.collectItemsFromJson(tree['itemList'])
+        rows = ItemTable.fromRows(api.iterItemsFromLines(lines, True, bulk=bulk, workers=workers,
+                                                          previous=seen, manifest=seen))
+        timing = {"project": project["project"], "folder": folder_id, "rows": len(rows),
+                  "crawl": time.perf_counter() - start, "write": 0.0}
+        timings.append(timing)
+        if api.getClient().cache is not None:
+            # Values stored from the payload, written once per folder
+            api.getClient().cache.flush()
+        if not rows:
+            print("\n### No item exported from " + folder_id)
+            continue
+        # Resolved here, the next project resets api's lookups while this one is still being written
+        index = api.getFolderIndex(api.getCategory(folder_id)) if export.get("path") else None
+        futures.append(executor.submit(write_export, export, tree.get('title', folder_id), rows, index, timing, trace))
+    if trace is not None:
+        # Submitted after the exports, so they are all started before it waits on them
+        futures.append(executor.submit(write_trace, project, trace[0], list(futures)))
+    return futures
+
+
+def write_export(export, folder_name, rows, index, timing, trace=None):
+    # trace: (project TraceIndex, lock), this export is indexed on its own then merged into it
+    start = time.perf_counter()
+    own = TraceIndex() if trace is not None else None
+    if index is not None:
+        rows = matrix_export.with_path(rows, index)
+    matrix_export.export_rows(rows, export["output"], export.get("title", folder_name), export.get("virtual", False),
+                              export.get("formats", ["xlsx"]), own)
+    if trace is not None:
+        with trace[1]:
+            trace[0].update(own)
+    timing["write"] = time.perf_counter() - start
+
+
+def write_trace(project, trace, futures):
+    for future in futures:
+        future.result()   # no trace output when an export failed
+    matrix_export.export_trace(trace, project["trace"], project.get("title", project["project"]))
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--manifest", required=True, type=str, help="Batch manifest (JSON) listing projects, folders and outputs")
+    parser.add_argument("-w", "--workers", required=False, type=int, default=None, help="Number of items fetched in parallel, default is the manifest \'workers\' or 1")
+    parser.add_argument("--writers", required=False, type=int, default=4, help="Number of outputs written in parallel, default is 4")
+    parser.add_argument("--cache_file", required=False, type=str, default="matrix_cache.sqlite", help="Response cache, default is \'matrix_cache.sqlite\'")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses and store fresh ones")
+    parser.add_argument("--profile", action="store_true", help="Also print requests, latencies and time per stage over the whole batch")
+    args = parser.parse_args()
+
+    batch = load_batch(args.manifest)
+    workers = args.workers or batch.get("workers", 1)
+    if args.profile:
+        profiling.enable()
+    cache = None if args.no_cache else ResponseCache(args.cache_file, refresh=args.refresh)
+    start = time.perf_counter()
+    timings = []
+    requests = {}
+    with ThreadPoolExecutor(max_workers=args.writers) as executor:
+        futures = []
+        for project in batch.get("projects", []):
+            api.configure(url=project.get("url"), token=project.get("token"), project=project["project"])
+            client = api.getClient(pool_size=max(10, workers), cache=cache)
+            print("\n### Project " + project["project"] + " ....\n")
+            futures += crawl_project(project, workers, executor, timings)
+            requests[project["project"]] = client.request_count
+        for future in futures:
+            future.result()
+
+    print(f"\n### Batch: {len(timings)} exports, {sum(requests.values())} requests in {time.perf_counter() - start:.2f} s\n")
+    print(f"{'project':<12} {'folder':<14} {'rows':>7} {'crawl s':>8} {'write s':>8}")
+    for timing in timings:
+        print(f"{timing['project']:<12} {timing['folder']:<14} {timing['rows']:>7} {timing['crawl']:>8.2f} {timing['write']:>8.2f}")
+    for name, count in requests.items():
+        print(f"{name}: {count} requests")
+    if args.profile:
+        print(profiling.profiler.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+# Micro-benchmark of clean_from_html on multi-KB rich-text descriptions
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from html_clean import clean_from_html
+
+
+def legacy_clean_from_html(input):
+    # Implementation previously duplicated in matrix_api.py and matrix_export.py
+    if input is None:
+        return ""
+    p = re.compile(r'<.*?>')
+    output = p.sub('', input)
+    output = output.replace('&nbsp;', '')
+    output = output.replace('&deg;', '°')
+    output = output.replace('&lt;', '<')
+    output = output.replace('&gt;', '>')
+    output = output.replace('&ldquo;', '\"')
+    output = output.replace('&rdquo;', '\"')
+    output = output.replace('&#39;', '\'')
+    output = output.replace('&quot;', '\'')
+    output = output.replace('&micro;', 'u')
+    return output
+
+
+PARAGRAPH = ("<p>The pump <strong>shall</strong> stop within 50&nbsp;ms when the temperature exceeds 42&deg;C "
+             "(see <a href=\"#SRS-12\">SRS-12</a>) &ldquo;as specified&rdquo; in the user&#39;s manual, "
+             "with a dose &lt; 10&micro;g &amp; a flow &gt; 2 ml/h.</p>\n")
+TYPICAL = ("<p>When the measured temperature exceeds the configured threshold for more than three consecutive "
+           "samples, the controller shall stop the pump, raise a high priority alarm and log the event.&nbsp;</p>\n"
+           "<ul><li>Threshold: 42&deg;C</li><li>Sampling period: 10 ms</li></ul>\n")
+PLAIN = "The pump shall stop within 50 ms when the temperature exceeds 42 C.\n"
+
+
+def main():
+    for size_kb in (1, 4, 16, 64):
+        samples = (("dense", PARAGRAPH), ("typical", TYPICAL), ("plain", PLAIN))
+        for name, sample in samples:
+            text = sample * (size_kb * 1024 // len(sample) + 1)
+            number = max(10, 2000 // size_kb)
+            legacy = min(timeit.repeat(lambda: legacy_clean_from_html(text), number=number, repeat=3)) / number
+            shared = min(timeit.repeat(lambda: clean_from_html(text), number=number, repeat=3)) / number
+            print(f"{size_kb:>3} KB {name:<8} legacy {legacy * 1e6:9.1f} us   shared {shared * 1e6:9.1f} us"
+                  f"   x{legacy / shared:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+# End-to-end benchmark of getMatrixItemsFromFolder and matrix_export.main against the local stub server
+import argparse
+import contextlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_server import StubMatrix, SyntheticProject
+
+
+def run_case(url, project, case, queue):
+    # Runs in a fresh process so peak RSS belongs to this case only
+    import matrix_api as api
+    import matrix_export
+    api.configure(url=url, token="stub", project=project)
+    kind, folder, workers = case
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        if kind == "api":
+            api.getMatrixItemsFromFolder(folder, workers=workers)
+        else:
+            sys.argv = ["matrix_export.py", "-f", folder, "-t", folder, "-o", os.path.join(tmp, "export"),
+                        "-w", str(workers), "--no-cache"]
+            matrix_export.main()
+        elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--items", type=int, default=2000, help="Items in the synthetic project, default is 2000")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds added to every response, default is 0.005")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--field_size", type=int, default=400, help="Rich-text field size in characters, default is 400")
+    parser.add_argument("--missing", type=float, default=0.2, help="Share of items fetched field by field, default is 0.2")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Workers for the parallel cases, default is 8")
+    args = parser.parse_args()
+
+    project = SyntheticProject(items=args.items, field_size=args.field_size, missing=args.missing)
+    stub = StubMatrix(project, latency=args.latency, throttle=args.throttle).start()
+    cases = [("api", "F-SRS-1", 1), ("api", "F-FMEA-1", 1), ("api", "F-FMEA-1", args.workers),
+             ("export", "F-SRS-1", 1), ("export", "F-FMEA-1", args.workers)]
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'case':<28} {'wall':>8} {'requests':>9} {'429':>5} {'bytes':>10} {'peak RSS':>9}")
+    try:
+        for case in cases:
+            stub.reset()
+            queue = ctx.Queue()
+            process = ctx.Process(target=run_case, args=(stub.url, stub.name, case, queue))
+            process.start()
+            elapsed, rss = queue.get()
+            process.join()
+            stats = stub.stats
+            name = f"{case[0]} {case[1]} w={case[2]}"
+            print(f"{name:<28} {elapsed:7.2f}s {stats['requests']:>9} {stats['throttled']:>5} "
+                  f"{stats['bytes'] / 1024:>8.0f}KB {rss:>7.0f}MB")
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
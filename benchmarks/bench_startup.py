@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+# Startup time of `import matrix_api` / `import matrix_export` in a fresh interpreter
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def time_import(module, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--runs", type=int, default=10, help="Interpreter launches per module, default is 10")
+    parser.add_argument("--max-ms", type=float, default=None, help="Exit with an error if a median import is slower")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("sys", args.runs))
+    print(f"{'python -c pass':<16} {baseline * 1000:7.1f} ms")
+    failed = False
+    for module in ("matrix_api", "matrix_export"):
+        median = statistics.median(time_import(module, args.runs))
+        print(f"{'import ' + module:<16} {median * 1000:7.1f} ms   (+{(median - baseline) * 1000:.1f} ms)")
+        if args.max_ms is not None and (median - baseline) * 1000 > args.max_ms:
+            failed = True
+    if failed:
+        sys.exit(f"Import slower than {args.max_ms} ms")
+
+
+if __name__ == '__main__':
+    main()
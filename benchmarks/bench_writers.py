@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# Compare the pandas DataFrame XLSX path with the streaming writers on wide FMEA-like rows
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from matrix_export import export_xls
+from table_writers import WRITERS
+
+COLUMNS = ['ID', 'Title', 'item', 'failure', 'effect', 'cause', 'P1', 'S1', 'Mitigation']
+
+
+def make_rows(count):
+    # Generator, so the streaming writers never see the whole table at once
+    for i in range(count):
+        yield {'ID': f'FMEA-{i}', 'Title': f'Hazard {i}', 'item': 'Pump controller',
+               'failure': 'Over-infusion', 'effect': 'Patient receives too much drug',
+               'cause': f'Software fault in dose computation {i % 17}', 'P1': str(i % 5 + 1),
+               'S1': str(i % 4 + 2), 'Mitigation': 'Independent watchdog stops the motor (SRS-12, SDD-4)'}
+
+
+def measure(action):
+    tracemalloc.start()
+    start = time.perf_counter()
+    action()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def stream(writer, path, count):
+    def action():
+        w = writer(path, COLUMNS)
+        for row in make_rows(count):
+            w.write(row)
+        w.close()
+    return action
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            print(f"\n### {count} rows")
+            results = [("pandas xlsx", measure(lambda: export_xls(list(make_rows(count)), os.path.join(tmp, "pandas.xlsx"))))]
+            for name, (writer, extension) in WRITERS.items():
+                try:
+                    results.append((name, measure(stream(writer, os.path.join(tmp, "out" + extension), count))))
+                except ImportError as e:
+                    print(f"{name:<12} skipped: {e}")
+            for name, (elapsed, peak) in results:
+                print(f"{name:<12} {elapsed:7.2f} s   peak {peak / 1024 / 1024:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+# Local stand-in for the Matrix REST API (/item, /field, /cat) serving a synthetic project
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FIELDS = {
+    "SRS": [{"id": 1, "label": "Description", "fieldType": "richtext"},
+            {"id": 2, "label": "Labels", "fieldType": "labels"}],
+    "FMEA": [{"id": 10, "label": "FMEA", "fieldType": "risk2"},
+             {"id": 11, "label": "Risk Mitigation Comment", "fieldType": "richtext"}],
+}
+SEVERITY = ["1-Negligible", "2-Minor", "3-Moderate", "4-Significant", "5-Catastrophic"]
+PROBABILITY = ["1-Improbable", "2-Rare", "3-Unlikely", "4-Possible", "5-Frequent"]
+WORDS = ("the pump shall stop motor alarm dose flow sensor temperature threshold watchdog "
+         "controller user display battery occlusion infusion rate limit").split()
+
+
+class SyntheticProject:
+    """
+    Deterministic synthetic Matrix project.
+    - items: number of items per category (SRS and FMEA)
+    - depth / fanout: folder tree shape below each category root folder F-<CAT>-1
+    - field_size: approximate size of rich-text fields in characters
+    - obsolete: add one folder titled "obsolete" per category
+    - missing: share of items whose field values are left out of fields=1 folder payloads
+    """
+    def __init__(self, items=1000, depth=2, fanout=4, field_size=400, fmea_ratio=0.5, obsolete=True,
+                 missing=0.0, seed=0):
+        self.field_size = field_size
+        self.missing = missing
+        self.seed = seed
+        self.items = {}
+        self.folders = {}
+        self.counts = {"FMEA": int(items * fmea_ratio), "SRS": items - int(items * fmea_ratio)}
+        for cat, count in self.counts.items():
+            self.build_category(cat, count, depth, fanout, obsolete)
+
+    def build_category(self, cat, count, depth, fanout, obsolete):
+        next_folder = [1]
+
+        def new_folder(title, parent):
+            ref = f"F-{cat}-{next_folder[0]}"
+            next_folder[0] += 1
+            self.folders[ref] = {"itemRef": ref, "title": title, "parent": parent, "children": []}
+            if parent:
+                self.folders[parent]["children"].append(ref)
+            return ref
+
+        root = new_folder(f"{cat} root", None)
+        leaves = [root]
+        for level in range(depth):
+            leaves = [new_folder(f"{cat} folder {level}.{i}", parent)
+                      for parent in leaves for i in range(fanout)]
+        if obsolete:
+            leaves.append(new_folder(f"{cat} obsolete", root))
+        for i in range(1, count + 1):
+            folder = leaves[i % len(leaves)]
+            ref = f"{cat}-{i}"
+            self.items[ref] = {"itemRef": ref, "title": f"{cat} item {i}", "folder": folder, "version": 1 + i % 3}
+            self.folders[folder]["children"].append(ref)
+
+    def text(self, ref, field, size):
+        rng = random.Random(f"{self.seed}/{ref}/{field}")
+        words = []
+        length = 0
+        while length < size:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return "<p>" + " ".join(words) + "&nbsp;</p>"
+
+    def field(self, ref, label):
+        cat = ref.split("-")[0]
+        rng = random.Random(f"{self.seed}/{ref}")
+        if label == "Description":
+            return self.text(ref, label, self.field_size)
+        if label == "Labels":
+            return rng.choice(["", "Safety", "Safety,Performance", "Usability"])
+        if label == "Risk Mitigation Comment":
+            return self.text(ref, label, self.field_size // 2) + f" see SRS-{rng.randint(1, 50)}"
+        if label == "FMEA" and cat == "FMEA":
+            return json.dumps({"factors": [
+                {"type": "item", "value": "Pump controller"},
+                {"type": "failure", "value": "Over-infusion", "weights": [{"type": "P1", "value": rng.choice(PROBABILITY)},
+                                                                          {"label": "Detectability", "value": str(rng.randint(1, 5))}]},
+                {"type": "effect", "value": "Patient receives too much drug"},
+                # Rich text with entities, the value must survive as valid JSON
+                {"type": "cause", "value": self.text(ref, label, 60) + ' reads &quot;0&quot; &#92; &amp; &lt;5&gt;'},
+                {"type": "Harm", "value": "Overdose", "weights": [{"type": "S1", "value": rng.choice(SEVERITY)}]},
+            ], "postWeights": [{"type": "P2", "value": rng.choice(PROBABILITY[:3])},
+                               {"type": "S2", "value": rng.choice(SEVERITY)},
+                               {"value": str(rng.randint(1, 5))}]})
+        return None
+
+    def item_json(self, ref, fields):
+        item = self.items[ref]
+        out = {"isFolder": 0, "itemRef": ref, "title": item["title"], "version": item["version"]}
+        if fields and random.Random(f"{self.seed}/{ref}/missing").random() >= self.missing:
+            cat = ref.split("-")[0]
+            out["fieldValList"] = {"fieldVal": [{"id": f["id"], "value": self.field(ref, f["label"])}
+                                                for f in FIELDS[cat]]}
+        return out
+
+    def folder_json(self, ref, fields):
+        folder = self.folders[ref]
+        return {"isFolder": 1, "itemRef": ref, "title": folder["title"],
+                "itemList": [self.folder_json(child, fields) if child in self.folders else self.item_json(child, fields)
+                             for child in folder["children"]]}
+
+
+class StubMatrix:
+    """
+    HTTP server for a SyntheticProject, in a background thread.
+    - latency: seconds added to every response
+    - throttle: probability of answering 429 with Retry-After
+    """
+    def __init__(self, project=None, host="127.0.0.1", port=0, name="BENCH", latency=0.0, throttle=0.0, retry_after=0.05):
+        self.project = project or SyntheticProject()
+        self.name = name
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.body_cache = {}
+        self.reset()
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"requests": 0, "bytes": 0, "throttled": 0, "endpoints": {}}
+
+    def count(self, endpoint, size, throttled=False):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += size
+            self.stats["throttled"] += throttled
+            self.stats["endpoints"][endpoint] = self.stats["endpoints"].get(endpoint, 0) + 1
+
+    def body(self, kind, ident, query):
+        key = (kind, ident, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        if key in self.body_cache:
+            return self.body_cache[key]
+        project = self.project
+        body = None
+        if kind == "cat" and ident in FIELDS:
+            body = json.dumps({"fieldList": FIELDS[ident], "folder": project.folder_json(f"F-{ident}-1", False)})
+        elif kind == "item" and ident in project.folders:
+            fields = query.get("fields") == ["1"]
+            if query.get("children") == ["yes"]:
+                body = json.dumps(project.folder_json(ident, fields))
+            else:
+                body = json.dumps({"isFolder": 1, "itemRef": ident, "title": project.folders[ident]["title"]})
+        elif kind == "item" and ident in project.items:
+            body = json.dumps(project.item_json(ident, query.get("fields") == ["1"]))
+        elif kind == "field" and ident in project.items:
+            body = project.field(ident, query.get("field", [""])[0])
+        if body is not None:
+            body = body.encode("utf-8")
+            self.body_cache[key] = body
+        return body
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes, avoid the delayed-ACK stall on keep-alive
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body, endpoint, headers=()):
+                if "gzip" in self.headers.get("Accept-Encoding", "") and len(body) > 512:
+                    body = gzip.compress(body, 5)
+                    headers = list(headers) + [("Content-Encoding", "gzip")]
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                stub.count(endpoint, len(body), status == 429)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if len(parts) != 3 or parts[0] != stub.name:
+                    return self.send(404, b"Not found", "other")
+                kind, ident = parts[1], parts[2]
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.throttle and random.random() < stub.throttle:
+                    return self.send(429, b"Too many requests", kind, [("Retry-After", str(stub.retry_after))])
+                body = stub.body(kind, ident, parse_qs(url.query))
+                if body is None:
+                    return self.send(404, b"Not found", kind)
+                self.send(200, body, kind)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--port", type=int, default=8000, help="Port, default is 8000")
+    parser.add_argument("-n", "--items", type=int, default=1000, help="Items per project, default is 1000")
+    parser.add_argument("--depth", type=int, default=2, help="Folder depth below each category root, default is 2")
+    parser.add_argument("--fanout", type=int, default=4, help="Sub-folders per folder, default is 4")
+    parser.add_argument("--fmea_ratio", type=float, default=0.5, help="Share of FMEA items, default is 0.5")
+    parser.add_argument("--field_size", type=int, default=400, help="Rich-text field size in characters, default is 400")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--missing", type=float, default=0.0, help="Share of items without embedded field values")
+    args = parser.parse_args()
+
+    project = SyntheticProject(args.items, args.depth, args.fanout, args.field_size, args.fmea_ratio,
+                               missing=args.missing)
+    stub = StubMatrix(project, port=args.port, latency=args.latency, throttle=args.throttle)
+    print(f'{{"url": "{stub.url}", "token": "stub", "project": "{stub.name}"}}')
+    print("Folders: F-SRS-1, F-FMEA-1")
+    stub.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+import matrix_api as api
+import matrix_export
+from matrix_cache import ResponseCache
+
+CONTENT_TYPES = {
+    "html": "text/html; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/octet-stream",
+    "json": "application/json",
+}
+
+
+class Coalescer:
+    """One computation per key at a time, concurrent callers of the same key wait for it and share its result."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def run(self, key, compute):
+        with self.lock:
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = self.pending[key] = Future()
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.pending[key]
+        return future.result()
+
+
+class WarmFolder:
+    """Rows of a folder kept in memory (ItemTable), with the item versions needed to refresh them incrementally."""
+    def __init__(self, folder_id, title, rows, manifest):
+        self.folder_id = folder_id
+        self.title = title
+        self.rows = rows
+        self.versions = {item_id: known['version'] for item_id, known in manifest.items()}
+        self.generation = 1
+        self.refreshed = time.time()
+        self.rendered = {}   # format -> bytes, for this generation
+
+
+class ExportService:
+    """
+    Warm folders and rendered exports of a long-running process.
+    - workers: items fetched in parallel
+    - interval: seconds between background refreshes, only changed items are fetched again
+    """
+    def __init__(self, workers=1, interval=300):
+        self.workers = workers
+        self.interval = interval
+        self.folders = {}
+        self.lock = threading.Lock()
+        self.loads = Coalescer()
+        self.renders = Coalescer()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stop = threading.Event()
+        self.thread = None
+
+    def folder(self, folder_id):
+        # Warm folder, crawled on first use, concurrent first uses share one crawl
+        warm = self.folders.get(folder_id)
+        if warm is not None:
+            return warm
+        return self.loads.run(folder_id, lambda: self.load(folder_id))
+
+    def load(self, folder_id):
+        manifest = {}
+        rows = api.getItemTableFromFolder(folder_id, workers=self.workers, manifest=manifest)
+        if not rows:
+            raise ValueError(f"No item exported from {folder_id}")
+        warm = WarmFolder(folder_id, api.getFolderName(folder_id), rows, manifest)
+        with self.lock:
+            self.folders[folder_id] = warm
+        return warm
+
+    def refresh(self, folder_id):
+        # Listing plus changed items only; readers keep the previous rows until the swap
+        def compute():
+            warm = self.folders[folder_id]
+            previous = {row['ID']: {'version': warm.versions.get(row['ID']), 'row': row} for row in warm.rows}
+            manifest = {}
+            rows = api.getItemTableFromFolder(folder_id, workers=self.workers,
+                                              previous=previous, manifest=manifest)
+            if not rows and warm.rows:
+                print(f"Refresh of {folder_id} returned no item, keeping the previous rows")
+                return warm
+            changed = matrix_export.delta_report(previous, manifest)
+            if any(changed.values()):
+                fresh = WarmFolder(folder_id, warm.title, rows, manifest)
+                fresh.generation = warm.generation + 1
+                with self.lock:
+                    self.folders[folder_id] = fresh
+                return fresh
+            warm.refreshed = time.time()
+            return warm
+        return self.loads.run(folder_id, compute)
+
+    def refreshAll(self):
+        # Folder titles and field IDs may have changed too
+        for category in list(api.field_ids):
+            api.loadCategory(category)
+        for folder_id in list(self.folders):
+            try:
+                self.refresh(folder_id)
+            except Exception as e:
+                print(f"Refresh of {folder_id} failed: {e}")
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            self.refreshAll()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def render(self, folder_id, kind):
+        # Export file of the current generation, rendered once
+        warm = self.folder(folder_id)
+        if kind in warm.rendered:
+            return warm.rendered[kind]
+
+        def compute():
+            if kind in warm.rendered:
+                return warm.rendered[kind]
+            base = os.path.join(self.tmp.name, f"{folder_id}.{warm.generation}")
+            formats = [] if kind == "html" else [kind]
+            matrix_export.export_rows(warm.rows, base, warm.title, formats=formats)
+            paths = [base + ".html"] if kind == "html" else [base + ".html", base + matrix_export.WRITERS[kind][1]]
+            for path in paths:
+                with open(path, "rb") as f:
+                    warm.rendered[os.path.splitext(path)[1][1:]] = f.read()
+                os.remove(path)
+            return warm.rendered[kind]
+        return self.renders.run((folder_id, warm.generation, kind), compute)
+
+    def rows(self, folder_id, columns=None):
+        warm = self.folder(folder_id)
+        columns = columns or warm.rows.columns
+        rows = [dict(zip(columns, values)) for values in warm.rows.iterValues(columns)]
+        return json.dumps({"folder": folder_id, "title": warm.title, "generation": warm.generation,
+                           "refreshed": warm.refreshed, "rows": rows}).encode("utf-8")
+
+    def status(self):
+        return json.dumps({
+            "requests": api.getClient().request_count,
+            "interval": self.interval,
+            "folders": {ref: {"title": warm.title, "rows": len(warm.rows), "generation": warm.generation,
+                              "refreshed": warm.refreshed} for ref, warm in self.folders.items()},
+        }, indent=4).encode("utf-8")
+
+
+def make_handler(service):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} {format % args}")
+
+        def send(self, status, body, kind="json"):
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", CONTENT_TYPES.get(kind, "text/plain; charset=utf-8"))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # /export/<folder>.<format>, /rows/<folder>?columns=ID,Title, /refresh/<folder>, /status
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            query = parse_qs(url.query)
+            try:
+                if parts == ["status"]:
+                    return self.send(200, service.status())
+                if len(parts) != 2:
+                    return self.send(404, "Not found", "text")
+                action, target = parts
+                if action == "export":
+                    folder_id, _, kind = target.rpartition(".")
+                    if kind != "html" and kind not in matrix_export.WRITERS:
+                        return self.send(400, f"Unknown format '{kind}', expected html, " + ", ".join(matrix_export.WRITERS), "text")
+                    return self.send(200, service.render(folder_id, kind), kind)
+                if action == "rows":
+                    columns = query["columns"][0].split(",") if "columns" in query else None
+                    return self.send(200, service.rows(target, columns))
+                if action == "refresh":
+                    service.folder(target)
+                    warm = service.refresh(target)
+                    return self.send(200, json.dumps({"folder": target, "generation": warm.generation}))
+                return self.send(404, "Not found", "text")
+            except ValueError as e:
+                # No item in the folder (unknown folder, listing error)
+                return self.send(404, str(e), "text")
+            except Exception as e:
+                # 502 when the Matrix server could not be reached, 500 for anything else (writer, disk, bug)
+                self.log_message("%s failed: %r", self.path, e)
+                status = 502 if isinstance(e, requests.RequestException) else 500
+                return self.send(status, f"{type(e).__name__}: {e}", "text")
+
+    return Handler
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", required=False, type=str, default="127.0.0.1", help="Address to listen on, default is \'127.0.0.1\'")
+    parser.add_argument("-p", "--port", required=False, type=int, default=8080, help="Port, default is 8080")
+    parser.add_argument("-w", "--workers", required=False, type=int, default=1, help="Number of items fetched in parallel, default is 1")
+    parser.add_argument("--interval", required=False, type=float, default=300, help="Seconds between background refreshes, default is 300")
+    parser.add_argument("--preload", required=False, type=str, nargs="*", default=[], help="Folders crawled at startup")
+    parser.add_argument("--cache_file", required=False, type=str, default="matrix_cache.sqlite", help="Response cache, default is \'matrix_cache.sqlite\'")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true", help="Do not read or write the response cache")
+    args = parser.parse_args()
+
+    # Listings are never served from the cache, the refresh has to see new versions
+    cache = None if args.no_cache else ResponseCache(args.cache_file, ttl=0)
+    api.getClient(pool_size=max(10, args.workers), cache=cache)
+    service = ExportService(workers=args.workers, interval=args.interval)
+    for folder_id in args.preload:
+        service.folder(folder_id)
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    host, port = server.server_address[:2]
+    print(f"\n### Serving on http://{host}:{port}/export/<folder>.html|" + "|".join(matrix_export.WRITERS) +
+          ", /rows/<folder>, /refresh/<folder>, /status\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import numpy as np
+
+from weights import RISK_THRESHOLDS, rowWeights, weightValue
+
+
+class FmeaTable:
+    """
+    Columnar table of the FMEA items of a folder.
+    - ids: item IDs, in folder order
+    - weights: weight type -> float array (nan where the item has no such weight)
+    - thresholds: RPN upper bounds of the "Acceptable" and "Review" levels
+    Risk figures are computed on whole columns at once.
+    """
+    def __init__(self, ids, weights, thresholds=RISK_THRESHOLDS):
+        self.ids = list(ids)
+        self.weights = weights
+        self.thresholds = thresholds
+
+    @classmethod
+    def fromRows(cls, rows, thresholds=RISK_THRESHOLDS):
+        # rows: exported FMEA rows (matrix_api.fieldColumns), every weight kept, WEIGHTS at least
+        rows = list(rows)
+        return cls.fromWeights([row['ID'] for row in rows], [rowWeights(row) for row in rows], thresholds)
+
+    @classmethod
+    def fromWeights(cls, ids, rows, thresholds=RISK_THRESHOLDS):
+        # rows: one {weight type: value} dict per item
+        keys = []
+        for row in rows:
+            for key in row:
+                if key not in keys:
+                    keys.append(key)
+        weights = {key: np.array([weightValue(row.get(key)) for row in rows], dtype=float) for key in keys}
+        return cls(ids, weights, thresholds)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, key):
+        return self.weights.get(key, np.full(len(self.ids), np.nan))
+
+    def rpn(self, probability="P1", severity="S1"):
+        return self.column(probability) * self.column(severity)
+
+    def riskLevel(self, rpn, thresholds=None):
+        # "Acceptable(4)", "Review(6)", "Unacceptable(20)" or "" when a weight is missing
+        thresholds = thresholds or self.thresholds
+        labels = np.select([rpn <= thresholds[0], rpn <= thresholds[1], rpn > thresholds[1]],
+                           ["Acceptable", "Review", "Unacceptable"], "")
+        return [f"{label}({int(value)})" if label else "" for label, value in zip(labels, rpn)]
+
+    def riskMatrix(self, probability="P1", severity="S1"):
+        """Item counts indexed [probability][severity], index 0 unused, rows with a missing weight skipped."""
+        p = self.column(probability)
+        s = self.column(severity)
+        valid = ~(np.isnan(p) | np.isnan(s))
+        p = p[valid].astype(int)
+        s = s[valid].astype(int)
+        size = max(5, int(p.max(initial=0)), int(s.max(initial=0))) + 1
+        matrix = np.zeros((size, size), dtype=int)
+        np.add.at(matrix, (p, s), 1)
+        return matrix
+
+    def summary(self):
+        """Before/after mitigation RPN, risk levels and risk matrices, computed in one go."""
+        before = self.rpn("P1", "S1")
+        after = self.rpn("P2", "S2")
+        return {
+            "rpn_before": before,
+            "rpn_after": after,
+            "risk_before": self.riskLevel(before),
+            "risk_after": self.riskLevel(after),
+            "matrix_before": self.riskMatrix("P1", "S1"),
+            "matrix_after": self.riskMatrix("P2", "S2"),
+        }
+
+    def rows(self):
+        # One dict per item, for the table writers
+        summary = self.summary()
+        keys = list(self.weights)
+        for i, item_id in enumerate(self.ids):
+            row = {"ID": item_id}
+            for key in keys:
+                value = self.weights[key][i]
+                row[key] = "" if np.isnan(value) else int(value)
+            row["RPN before"] = "" if np.isnan(summary["rpn_before"][i]) else int(summary["rpn_before"][i])
+            row["Risk before"] = summary["risk_before"][i]
+            row["RPN after"] = "" if np.isnan(summary["rpn_after"][i]) else int(summary["rpn_after"][i])
+            row["Risk after"] = summary["risk_after"][i]
+            yield row
+
+
+def formatRiskMatrix(matrix, title):
+    size = matrix.shape[0]
+    lines = [title, "P \\ S " + "".join(f"{s:>6}" for s in range(1, size))]
+    for p in range(size - 1, 0, -1):
+        lines.append(f"{p:>5} " + "".join(f"{matrix[p][s]:>6}" for s in range(1, size)))
+    return "\n".join(lines)
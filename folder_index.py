@@ -0,0 +1,72 @@
+# Folders whose title contains one of these are left out of exports, with everything below them
+EXCLUDED_TITLES = ["obsolete"]
+
+
+def isExcludedTitle(title, exclude=None):
+    return any(text in title for text in (EXCLUDED_TITLES if exclude is None else exclude))
+
+
+def getCategory(item):
+    # "SRS-12" -> "SRS", "F-SRS-2" -> "SRS"
+    parts = item.split('-')
+    if parts[0] == 'F' and len(parts) > 2:
+        return parts[1]
+    return parts[0]
+
+
+class FolderIndex:
+    """
+    Folder tree of a category, built once from the /cat (or /item?children=yes) payload.
+    Title, parent, path and item -> folder lookups are dict lookups. The exclusion rules
+    are applied while indexing, an excluded folder excludes everything below it.
+    - exclude: title substrings of excluded folders, default is EXCLUDED_TITLES
+    """
+    def __init__(self, exclude=None):
+        self.exclude = exclude
+        self.titles = {}
+        self.parents = {}
+        self.paths = {}
+        self.item_folders = {}
+        self.excluded = set()
+
+    def add(self, folder, parent=None):
+        # folder: {"itemRef", "title", "itemList"}, the category root may come without itemRef
+        ref = folder.get('itemRef')
+        if ref is not None:
+            self.addFolder(ref, folder.get('title', ''), parent)
+        for line in folder.get('itemList', []):
+            if line.get('isFolder') == 1:
+                self.add(line, ref)
+            else:
+                self.item_folders[line['itemRef']] = ref
+        return self
+
+    def addFolder(self, ref, title, parent=None):
+        # Parents are added before their children
+        self.titles[ref] = title
+        self.parents[ref] = parent
+        self.paths[ref] = self.paths[parent] + " / " + title if parent in self.paths else title
+        if parent in self.excluded or isExcludedTitle(title, self.exclude):
+            self.excluded.add(ref)
+
+    def addItem(self, item_id, folder_id):
+        self.item_folders[item_id] = folder_id
+
+    def __contains__(self, ref):
+        return ref in self.titles or ref in self.item_folders
+
+    def title(self, folder_id):
+        return self.titles.get(folder_id)
+
+    def parent(self, folder_id):
+        return self.parents.get(folder_id)
+
+    def path(self, ref):
+        # "SRS root / Pump / Alarms", for a folder or for the folder of an item
+        return self.paths.get(self.item_folders.get(ref, ref))
+
+    def folderOf(self, item_id):
+        return self.item_folders.get(item_id)
+
+    def isExcluded(self, ref):
+        return self.item_folders.get(ref, ref) in self.excluded
@@ -0,0 +1,59 @@
+import re
+from html.entities import html5
+
+TAG = re.compile(r'<.*?>')
+ENTITY = re.compile(r'&(#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[A-Za-z][A-Za-z0-9]{1,31});')
+
+# Entities whose output differs from the HTML5 table, kept for compatibility with older exports
+ENTITY_OVERRIDES = {
+    'nbsp': '',
+    'ldquo': '\"',
+    'rdquo': '\"',
+    'micro': 'u',
+}
+
+entity_cache = {}
+
+
+def decode_entity(name):
+    # Replacement for "&name;", the reference itself if unknown
+    if name in entity_cache:
+        return entity_cache[name]
+    if name in ENTITY_OVERRIDES:
+        value = ENTITY_OVERRIDES[name]
+    elif name[0] == '#':
+        try:
+            code = int(name[2:], 16) if name[1] in 'xX' else int(name[1:])
+            value = '\ufffd' if 0xD800 <= code <= 0xDFFF else chr(code)
+        except (ValueError, OverflowError):
+            value = '\ufffd'
+    else:
+        value = html5.get(name + ';', '&' + name + ';')
+    entity_cache[name] = value
+    return value
+
+
+def clean_from_html(input):
+    """
+    Strip tags and decode character references (full HTML5 table).
+    Tags go in one regex pass, then only the distinct entities actually present are
+    replaced with str.replace, which stays in C; a per-match Python callback is slower.
+    """
+    if input is None:
+        return ""
+    output = input
+    if '<' in output:
+        output = TAG.sub('', output)
+    if '&' not in output:
+        return output
+    produce_amp = []
+    for name in set(ENTITY.findall(output)):
+        value = decode_entity(name)
+        if '&' in value:
+            # &amp; and friends go last so their output is never decoded a second time
+            produce_amp.append((name, value))
+        else:
+            output = output.replace('&' + name + ';', value)
+    for name, value in produce_amp:
+        output = output.replace('&' + name + ';', value)
+    return output
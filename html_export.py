@@ -1,37 +1,135 @@
 from pathlib import Path
 import html
+import itertools
+import json
+import re
+
+from item_table import ItemTable
+from table_writers import warnUnknownKeys
+
+ROWS_MARKER = "<!--ROWS-->"
+
+STYLE = """  :root {
+    --bg: #0b0c10; --card: #16181d; --text: #e6e6e6; --muted: #9aa3ab;
+    --accent: #7aa2f7; --border: #2a2f36;
+  }
+  html, body { margin:0; padding:0; background:var(--bg); color:var(--text);
+    font-family: ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Helvetica, Arial; }
+  .wrapper {
+    width: 100vw;      /* take full viewport width */
+    margin: 0;         /* no left/right margin */
+    padding: 0;        /* no inner padding */
+  }
+  .card {
+    background: var(--card);
+    border: 1px solid var(--border);
+    border-radius: 0;  /* no rounded corners */
+    box-shadow: none;  /* optional: remove shadow for full-bleed look */
+    overflow: hidden;
+  }
+  .header { display:flex; flex-wrap:wrap; gap:12px; align-items:center; justify-content:space-between;
+    padding:16px; border-bottom:1px solid var(--border); }
+  .title { font-weight:700; font-size:18px; letter-spacing:.2px; }
+  .controls { display:flex; gap:10px; align-items:center; }
+  input[type="text"] { background:#0f1217; color:var(--text); border:1px solid var(--border);
+    border-radius:10px; padding:10px 12px; outline:none; width:220px; }
+  input[type="text"]::placeholder { color: var(--muted); }
+  button { background:#0f1217; color:var(--text); border:1px solid var(--border); border-radius:10px; padding:10px 12px; cursor:pointer; }
+  table { width:100%; border-collapse:separate; border-spacing:0; }
+  thead th { position:sticky; top:0; background:#13161c; z-index:1; }
+  th, td { text-align:left; padding:12px 14px; border-bottom:1px solid var(--border); vertical-align:top; font-size:14px; }
+  tr:hover td { background: rgba(122,162,247,0.06); }
+  th.sortable { user-select:none; cursor:pointer; }
+  .sort-indicator { margin-left:8px; opacity:.7; font-size:12px; }
+  tfoot td { padding:10px 14px; color:var(--muted); font-size:13px; }
+  .badge { background: rgba(122,162,247,0.12); color: var(--accent);
+    border:1px solid rgba(122,162,247,0.3); padding:2px 8px; border-radius:999px; font-size:12px; margin-left:8px; }
+"""
+
+
+def escape_cell(x):
+    if x is None:
+        return ""
+    s = str(x)
+    # escape HTML and keep newlines as <br> for readability
+    return html.escape(s).replace("\n", "<br>")
+
+
+class InteractiveTableWriter:
+    """
+    Write the interactive HTML table row by row instead of building the page in memory.
+    - out_path: str or Path
+    - columns: list of column names, fixed up front (missing keys are written empty)
+    - title: page/table title
+    """
+    def __init__(self, out_path, columns, title="Interactive Table"):
+        self.out_path = Path(out_path)
+        self.columns = list(columns)
+        self.count = 0
+        head, self.tail = page_template(self.columns, title).split(ROWS_MARKER)
+        self.cells = [f"<td data-col='{html.escape(col)}'>" for col in self.columns]
+        self.f = self.out_path.open("w", encoding="utf-8")
+        self.f.write(head)
+
+    def write(self, row):
+        tds = [cell + escape_cell(row.get(col, '')) + "</td>" for cell, col in zip(self.cells, self.columns)]
+        self.f.write("<tr>" + "".join(tds) + "</tr>")
+        self.count += 1
+
+    def writeValues(self, values):
+        # One row as a list of values in column order (ItemTable.iterValues)
+        tds = [cell + escape_cell(value) + "</td>" for cell, value in zip(self.cells, values)]
+        self.f.write("<tr>" + "".join(tds) + "</tr>")
+        self.count += 1
+
+    def close(self):
+        self.f.write(self.tail)
+        self.f.close()
+        return str(self.out_path)
+
 
 def generate_interactive_html_table(data, out_path="interactive_table.html", title="Interactive Table"):
     """
     Generate a standalone HTML file with a sortable, filterable table from a list of dicts.
-    - data: list[dict]  (each dict should have the same keys; extra/missing keys are handled)
+    - data: list[dict]  (each dict should have the same keys; extra/missing keys are handled),
+            an ItemTable, or any iterable of dicts, streamed to disk with the columns of the first row
     - out_path: str or Path
     - title: page/table title
     """
-    out_path = Path(out_path)
+    if isinstance(data, ItemTable):
+        if not len(data):
+            raise ValueError("data must be a non-empty list of dictionaries")
+        writer = InteractiveTableWriter(out_path, data.columns, title)
+        for values in data.iterValues():
+            writer.writeValues(values)
+        return writer.close()
+    if isinstance(data, list):
+        if not data:
+            raise ValueError("data must be a non-empty list of dictionaries")
+        # Derive columns from the first row to preserve order; include any keys that appear later
+        columns = dict.fromkeys(data[0].keys())
+        for row in data[1:]:
+            for k in row.keys():
+                if k not in columns:
+                    columns[k] = None
+        columns = list(columns)
+        rows = iter(data)
+    else:
+        rows = iter(data)
+        first = next(rows, None)
+        if first is None:
+            raise ValueError("data must be a non-empty list of dictionaries")
+        columns = list(first.keys())
+        rows = warnUnknownKeys(itertools.chain([first], rows), columns)
 
-    if not data:
-        raise ValueError("data must be a non-empty list of dictionaries")
+    writer = InteractiveTableWriter(out_path, columns, title)
+    for row in rows:
+        writer.write(row)
+    return writer.close()
 
-    # Derive columns from the first row to preserve order; include any keys that appear later
-    columns = list(data[0].keys())
-    for row in data[1:]:
-        for k in row.keys():
-            if k not in columns:
-                columns.append(k)
-
-    def escape_cell(x):
-        if x is None:
-            return ""
-        s = str(x)
-        # escape HTML and keep newlines as <br> for readability
-        return html.escape(s).replace("\n", "<br>")
-
-    # Build table rows
-    rows_html = []
-    for row in data:
-        tds = [f"<td data-col='{html.escape(col)}'>{escape_cell(row.get(col, ''))}</td>" for col in columns]
-        rows_html.append("<tr>" + "".join(tds) + "</tr>")
+
+def page_template(columns, title):
+    # Whole page, with ROWS_MARKER where the <tr> rows go
 
     # Headers and filter inputs
     ths_html = [f"<th data-col='{html.escape(col)}' class='sortable'>{html.escape(col)}"
@@ -46,42 +144,7 @@ def generate_interactive_html_table(data, out_path="interactive_table.html", tit
 <meta name="viewport" content="width=device-width, initial-scale=1"/>
 <title>{html.escape(title)}</title>
 <style>
-  :root {{
-    --bg: #0b0c10; --card: #16181d; --text: #e6e6e6; --muted: #9aa3ab;
-    --accent: #7aa2f7; --border: #2a2f36;
-  }}
-  html, body {{ margin:0; padding:0; background:var(--bg); color:var(--text);
-    font-family: ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Helvetica, Arial; }}
-  .wrapper {{
-    width: 100vw;      /* take full viewport width */
-    margin: 0;         /* no left/right margin */
-    padding: 0;        /* no inner padding */
-  }}
-  .card {{
-    background: var(--card);
-    border: 1px solid var(--border);
-    border-radius: 0;  /* no rounded corners */
-    box-shadow: none;  /* optional: remove shadow for full-bleed look */
-    overflow: hidden;
-  }}
-  .header {{ display:flex; flex-wrap:wrap; gap:12px; align-items:center; justify-content:space-between;
-    padding:16px; border-bottom:1px solid var(--border); }}
-  .title {{ font-weight:700; font-size:18px; letter-spacing:.2px; }}
-  .controls {{ display:flex; gap:10px; align-items:center; }}
-  input[type="text"] {{ background:#0f1217; color:var(--text); border:1px solid var(--border);
-    border-radius:10px; padding:10px 12px; outline:none; width:220px; }}
-  input[type="text"]::placeholder {{ color: var(--muted); }}
-  button {{ background:#0f1217; color:var(--text); border:1px solid var(--border); border-radius:10px; padding:10px 12px; cursor:pointer; }}
-  table {{ width:100%; border-collapse:separate; border-spacing:0; }}
-  thead th {{ position:sticky; top:0; background:#13161c; z-index:1; }}
-  th, td {{ text-align:left; padding:12px 14px; border-bottom:1px solid var(--border); vertical-align:top; font-size:14px; }}
-  tr:hover td {{ background: rgba(122,162,247,0.06); }}
-  th.sortable {{ user-select:none; cursor:pointer; }}
-  .sort-indicator {{ margin-left:8px; opacity:.7; font-size:12px; }}
-  tfoot td {{ padding:10px 14px; color:var(--muted); font-size:13px; }}
-  .badge {{ background: rgba(122,162,247,0.12); color: var(--accent);
-    border:1px solid rgba(122,162,247,0.3); padding:2px 8px; border-radius:999px; font-size:12px; margin-left:8px; }}
-</style>
+{STYLE}</style>
 </head>
 <body>
   <div class="wrapper">
@@ -104,7 +167,7 @@ def generate_interactive_html_table(data, out_path="interactive_table.html", tit
             </tr>
           </thead>
           <tbody>
-            {''.join(rows_html)}
+            {ROWS_MARKER}
           </tbody>
           <tfoot>
             <tr><td colspan="{len(columns)}">Tip: click a header to sort ↑/↓, type in the filter inputs to filter by column, or use the global search.</td></tr>
@@ -232,8 +295,232 @@ def generate_interactive_html_table(data, out_path="interactive_table.html", tit
 </body>
 </html>
 """
-    out_path.write_text(template, encoding="utf-8")
-    return str(out_path)
+    return template
+
+NATURAL_CHUNKS = re.compile(r'(\d+)')
+
+
+def natural_key(value):
+    # Same order as naturalCompare in the page: "SRS-2" < "SRS-10", numbers before text
+    return tuple((0, int(chunk), '') if chunk.isdigit() else (1, 0, chunk)
+                 for chunk in NATURAL_CHUNKS.split(value.strip()) if chunk)
+
+
+class VirtualTableWriter:
+    """
+    Interactive table backed by compact JSON, rendering only the rows in view (virtual scrolling).
+    Rows are kept as lists of strings until close(), which precomputes one integer sort rank
+    per cell so the page sorts with integer comparisons instead of parsing text.
+    - out_path: str or Path
+    - columns: list of column names, fixed up front (missing keys are written empty)
+    - title: page/table title
+    """
+    def __init__(self, out_path, columns, title="Interactive Table"):
+        self.out_path = Path(out_path)
+        self.columns = list(columns)
+        self.title = title
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(["" if row.get(col) is None else str(row.get(col)) for col in self.columns])
+
+    def writeValues(self, values):
+        self.rows.append(["" if value is None else str(value) for value in values])
+
+    def close(self):
+        ranks = []
+        for c in range(len(self.columns)):
+            values = sorted(set(row[c] for row in self.rows), key=natural_key)
+            rank_of = {value: rank for rank, value in enumerate(values)}
+            ranks.append([rank_of[row[c]] for row in self.rows])
+        payload = json.dumps({"columns": self.columns, "rows": self.rows, "ranks": ranks},
+                             ensure_ascii=False, separators=(",", ":"))
+        page = (VIRTUAL_TEMPLATE
+                .replace("__TITLE__", html.escape(self.title))
+                .replace("__STYLE__", STYLE)
+                .replace("__DATA__", payload.replace("</", "<\\/")))
+        self.out_path.write_text(page, encoding="utf-8")
+        return str(self.out_path)
+
+
+def generate_virtual_html_table(data, out_path="interactive_table.html", title="Interactive Table"):
+    """
+    Same page as generate_interactive_html_table, for large tables: data is embedded as JSON
+    and only the visible rows are in the DOM.
+    - data: list[dict] or any iterable of dicts (columns of the first row)
+    - out_path: str or Path
+    - title: page/table title
+    """
+    rows = iter(data)
+    first = next(rows, None)
+    if first is None:
+        raise ValueError("data must be a non-empty list of dictionaries")
+    writer = VirtualTableWriter(out_path, list(first.keys()), title)
+    for row in itertools.chain([first], rows):
+        writer.write(row)
+    return writer.close()
+
+
+VIRTUAL_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8"/>
+<meta name="viewport" content="width=device-width, initial-scale=1"/>
+<title>__TITLE__</title>
+<style>
+__STYLE__
+  .scroller { height: calc(100vh - 80px); overflow:auto; }
+  tbody td { height: 44px; max-width: 480px; overflow:hidden; text-overflow:ellipsis; white-space:nowrap; padding-top:0; padding-bottom:0; }
+  tr.spacer td { padding:0; border:0; height:0; }
+</style>
+</head>
+<body>
+  <div class="wrapper">
+    <div class="card">
+      <div class="header">
+        <div class="title">__TITLE__ <span id="rowCount" class="badge"></span></div>
+        <div class="controls">
+          <input id="globalSearch" type="text" placeholder="Global search…"/>
+          <button id="resetBtn">Reset filters</button>
+        </div>
+      </div>
+      <div class="scroller" id="scroller">
+        <table id="dataTable">
+          <thead><tr id="headRow"></tr><tr id="filterRow"></tr></thead>
+          <tbody id="body"></tbody>
+        </table>
+      </div>
+    </div>
+  </div>
+<script id="tableData" type="application/json">__DATA__</script>
+<script>
+(function() {
+  const data = JSON.parse(document.getElementById('tableData').textContent);
+  const columns = data.columns, rows = data.rows, ranks = data.ranks;
+  const ROW_HEIGHT = 45, OVERSCAN = 10;
+  const scroller = document.getElementById('scroller');
+  const tbody = document.getElementById('body');
+  const globalSearch = document.getElementById('globalSearch');
+  const resetBtn = document.getElementById('resetBtn');
+  const rowCountEl = document.getElementById('rowCount');
+  const headRow = document.getElementById('headRow');
+  const filterRow = document.getElementById('filterRow');
+
+  // Lower-cased text, built once, for filtering
+  const lower = rows.map(r => r.map(v => v.toLowerCase()));
+  const lowerJoined = lower.map(r => r.join('\\t'));
+
+  let sortState = { col: null, dir: 1 };
+  let view = rows.map((_, i) => i);
+
+  const ths = columns.map((col, c) => {
+    const th = document.createElement('th');
+    th.className = 'sortable';
+    th.textContent = col;
+    const ind = document.createElement('span');
+    ind.className = 'sort-indicator';
+    th.appendChild(ind);
+    th.addEventListener('click', () => {
+      sortState = (sortState.col === c) ? { col: c, dir: -sortState.dir } : { col: c, dir: 1 };
+      update();
+    });
+    headRow.appendChild(th);
+    return th;
+  });
+  const filterInputs = columns.map((col, c) => {
+    const th = document.createElement('th');
+    const input = document.createElement('input');
+    input.className = 'col-filter';
+    input.placeholder = 'Filter ' + col;
+    input.addEventListener('input', update);
+    th.appendChild(input);
+    filterRow.appendChild(th);
+    return input;
+  });
+
+  function cellColor(text) {
+    const val = Number(text.trim());
+    if (text.trim() === '' || isNaN(val) || !Number.isFinite(val)) return '';
+    if (val >= 4) return 'rgba(255, 80, 80, 0.25)';
+    if (val >= 3) return 'rgba(255, 165, 0, 0.25)';
+    return 'rgba(0, 200, 0, 0.25)';
+  }
+
+  function update() {
+    const needles = filterInputs.map(inp => inp.value.toLowerCase().trim());
+    const gq = globalSearch.value.toLowerCase().trim();
+    view = [];
+    for (let i = 0; i < rows.length; i++) {
+      let ok = true;
+      for (let c = 0; c < needles.length && ok; c++) {
+        if (needles[c] && !lower[i][c].includes(needles[c])) ok = false;
+      }
+      if (ok && gq && !lowerJoined[i].includes(gq)) ok = false;
+      if (ok) view.push(i);
+    }
+    ths.forEach(th => th.querySelector('.sort-indicator').textContent = '');
+    if (sortState.col !== null) {
+      const rk = ranks[sortState.col], dir = sortState.dir;
+      view.sort((a, b) => (rk[a] - rk[b]) * dir || a - b);
+      ths[sortState.col].querySelector('.sort-indicator').textContent = dir === 1 ? '↑' : '↓';
+    }
+    rowCountEl.textContent = view.length + ' / ' + rows.length + ' rows';
+    render();
+  }
+
+  function spacer(height) {
+    const tr = document.createElement('tr');
+    tr.className = 'spacer';
+    const td = document.createElement('td');
+    td.colSpan = columns.length;
+    td.style.height = height + 'px';
+    tr.appendChild(td);
+    return tr;
+  }
+
+  function render() {
+    const first = Math.max(0, Math.floor(scroller.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const count = Math.ceil(scroller.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN;
+    const last = Math.min(view.length, first + count);
+    const frag = document.createDocumentFragment();
+    frag.appendChild(spacer(first * ROW_HEIGHT));
+    for (let v = first; v < last; v++) {
+      const row = rows[view[v]];
+      const tr = document.createElement('tr');
+      for (let c = 0; c < columns.length; c++) {
+        const td = document.createElement('td');
+        td.textContent = row[c];
+        td.title = row[c];
+        const color = cellColor(row[c]);
+        if (color) td.style.background = color;
+        tr.appendChild(td);
+      }
+      frag.appendChild(tr);
+    }
+    frag.appendChild(spacer((view.length - last) * ROW_HEIGHT));
+    tbody.replaceChildren(frag);
+  }
+
+  let pending = false;
+  scroller.addEventListener('scroll', () => {
+    if (pending) return;
+    pending = true;
+    requestAnimationFrame(() => { pending = false; render(); });
+  });
+  window.addEventListener('resize', render);
+  globalSearch.addEventListener('input', update);
+  resetBtn.addEventListener('click', () => {
+    filterInputs.forEach(inp => inp.value = '');
+    globalSearch.value = '';
+    sortState = { col: null, dir: 1 };
+    update();
+  });
+  update();
+})();
+</script>
+</body>
+</html>
+"""
 
 # --- Example usage with your sample data ---
 if __name__ == "__main__":
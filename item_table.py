@@ -0,0 +1,124 @@
+from array import array
+
+from weights import weightValue
+
+# Columns with few distinct values, stored as integer codes into a list of interned values
+CATEGORICAL = ("Labels", "P1", "S1", "P2", "S2", "item", "failure", "effect", "Risk before", "Risk after")
+CHUNK = 10000
+
+
+class Categorical:
+    """Column of interned values: one code per row (-1 for None) into the list of distinct values."""
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array('i')
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def decode(self, start=0, stop=None):
+        lookup = self.values + [None]   # code -1 -> None
+        return [lookup[code] for code in self.codes[start:stop]]
+
+
+class ItemTable:
+    """
+    Exported items stored by column instead of one dict per item. The schema is fixed by the
+    first row (a later new key adds a column, empty for the rows before). Columns in CATEGORICAL
+    hold integer codes, the other ones a list of values.
+    - columns: column names
+    Writers take it through iterValues(), which yields plain value lists in column order.
+    """
+    def __init__(self, columns=()):
+        self.columns = []
+        self.data = {}
+        self.count = 0
+        for col in columns:
+            self.addColumn(col)
+
+    @classmethod
+    def fromRows(cls, rows):
+        # rows: any iterable of dicts, consumed one at a time
+        table = cls()
+        for row in rows:
+            table.append(row)
+        return table
+
+    def addColumn(self, col):
+        column = Categorical() if col in CATEGORICAL else []
+        for _ in range(self.count):
+            column.append(None)
+        self.columns.append(col)
+        self.data[col] = column
+
+    def append(self, row):
+        for col in row:
+            if col not in self.data:
+                self.addColumn(col)
+        for col in self.columns:
+            self.data[col].append(row.get(col))
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def column(self, col):
+        # Decoded values of one column
+        column = self.data[col]
+        return column.decode() if isinstance(column, Categorical) else list(column)
+
+    def numeric(self, col):
+        """Leading number of each value ("4-Possible" -> 4.0, nan when missing), parsed once per distinct value."""
+        column = self.data[col]
+        if isinstance(column, Categorical):
+            numbers = [weightValue(value) for value in column.values] + [float("nan")]
+            return array('d', (numbers[code] for code in column.codes))
+        return array('d', (weightValue(value) for value in column))
+
+    def iterValues(self, columns=None, chunk=CHUNK):
+        # One list of values per row, in the order of columns, decoded chunk by chunk
+        columns = self.columns if columns is None else columns
+        for start in range(0, self.count, chunk):
+            stop = min(start + chunk, self.count)
+            decoded = []
+            for col in columns:
+                column = self.data.get(col)
+                if column is None:
+                    decoded.append([None] * (stop - start))
+                elif isinstance(column, Categorical):
+                    decoded.append(column.decode(start, stop))
+                else:
+                    decoded.append(column[start:stop])
+            for values in zip(*decoded):
+                yield list(values)
+
+    def toDicts(self):
+        for values in self.iterValues():
+            yield dict(zip(self.columns, values))
+
+    __iter__ = toDicts
+
+    def toDataFrame(self):
+        """pandas DataFrame, categorical columns become pandas categoricals sharing the codes buffer."""
+        import numpy as np
+        import pandas as pd
+        data = {}
+        for col in self.columns:
+            column = self.data[col]
+            if isinstance(column, Categorical):
+                codes = np.frombuffer(column.codes, dtype=np.int32) if len(column) else np.zeros(0, dtype=np.int32)
+                data[col] = pd.Categorical.from_codes(codes, categories=pd.Index(column.values, dtype=object))
+            else:
+                data[col] = column
+        return pd.DataFrame(data, columns=self.columns)
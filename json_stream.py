@@ -0,0 +1,77 @@
+import json
+
+from folder_index import isExcludedTitle
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(text):
+    # orjson when installed, several times faster than json on large folder payloads
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def iterFolderItems(stream):
+    """
+    Item lines of a /item/{folder}?children=yes payload, parsed from a binary stream and yielded
+    one at a time in tree order, excluded (obsolete) folders skipped. Only the item being parsed
+    is held in memory, whatever the payload size. Needs ijson, which uses its C backend when available.
+    Folders are told apart from items by their "itemList" key. A folder whose title comes after
+    its itemList has its children buffered until the title tells whether it is excluded.
+    """
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError("Streaming needs ijson: pip install ijson")
+    yield from iterEvents(ijson.parse(stream, use_float=True), ijson)
+
+
+def iterEvents(events, ijson):
+    # Item lines out of ijson (prefix, event, value) events, see iterFolderItems
+    builder = None      # item being built, with its nesting depth
+    start = None        # prefix of the item being built
+    depth = 0
+    skip = None         # prefix of the itemList of an excluded folder
+    pending = None      # folder with no title yet: [prefix, title, buffered events of its itemList]
+    for prefix, event, value in events:
+        if skip is not None:
+            if prefix.startswith(skip):
+                continue
+            skip = None
+        if pending is not None:
+            folder, title, buffered = pending
+            if prefix.startswith(folder + ".itemList"):
+                buffered.append((prefix, event, value))
+            elif prefix == folder + ".title" and event == 'string':
+                pending[1] = value
+            elif prefix == folder and event == 'end_map':
+                pending = None
+                if not isExcludedTitle(title or ''):
+                    yield from iterEvents(iter(buffered), ijson)
+            continue
+        if builder is not None:
+            if depth == 1 and event == 'map_key' and value == 'itemList':
+                # A folder, its children are streamed as items of their own
+                if 'title' not in builder.value:
+                    pending = [start, None, []]
+                elif isExcludedTitle(builder.value['title']):
+                    skip = prefix + ".itemList"
+                builder = None
+                continue
+            if event in ('start_map', 'start_array'):
+                depth += 1
+            elif event in ('end_map', 'end_array'):
+                depth -= 1
+            builder.event(event, value)
+            if depth == 0:
+                yield builder.value
+                builder = None
+        elif event == 'start_map' and prefix.endswith('itemList.item'):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            start = prefix
+            depth = 1
@@ -1,31 +1,247 @@
-import requests
-from requests.structures import CaseInsensitiveDict
+from email.utils import parsedate_to_datetime
 import json
-import re
+import os
 import argparse
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from matrix_cache import CachedResponse, ResponseCache
+from html_clean import clean_from_html
+from folder_index import FolderIndex, isExcludedTitle, getCategory
+from json_stream import loads, iterFolderItems
+from item_table import ItemTable
+from weights import extractWeightsFromFMEA
+import profiling
 
-# Configuration - create config.json (see readme)
-with open("config.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-BASE_URL = data.get("url")
-API_TOKEN = data.get("token")
-PROJECT = data.get("project")
-
-def clean_from_html(input):
-    if input is None:
-        return ""
-    p = re.compile(r'<.*?>')
-    output = p.sub('', input)
-    output = output.replace('&nbsp;', '')
-    output = output.replace('&deg;', '°')
-    output = output.replace('&lt;', '<')
-    output = output.replace('&gt;', '>')
-    output = output.replace('&ldquo;', '\"')
-    output = output.replace('&rdquo;', '\"')
-    output = output.replace('&#39;', '\'')
-    output = output.replace('&quot;', '\'')
-    output = output.replace('&micro;', 'u')
-    return output
+# Configuration - config.json (see readme), MATRIX_URL / MATRIX_TOKEN / MATRIX_PROJECT
+# environment variables or configure(), read on first use
+CONFIG_ENV = {"url": "MATRIX_URL", "token": "MATRIX_TOKEN", "project": "MATRIX_PROJECT"}
+config = None
+
+def loadConfig(config_file=None):
+    # config.json (or MATRIX_CONFIG), overridden by the environment
+    values = {}
+    path = config_file or os.environ.get("MATRIX_CONFIG", "config.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            values.update(json.load(f))
+    for key, env in CONFIG_ENV.items():
+        if os.environ.get(env):
+            values[key] = os.environ[env]
+    return values
+
+
+def configure(url=None, token=None, project=None, config_file=None):
+    # Explicit arguments win over the environment and config.json; resets the shared client
+    # and what was resolved from the previous project
+    global config, client
+    config = loadConfig(config_file)
+    for key, value in (("url", url), ("token", token), ("project", project)):
+        if value is not None:
+            config[key] = value
+    client = None
+    field_ids.clear()
+    folder_indexes.clear()
+    return config
+
+
+def getConfig():
+    global config
+    if config is None:
+        config = loadConfig()
+    return config
+
+
+def __getattr__(name):
+    # BASE_URL, API_TOKEN and PROJECT used to be read from config.json at import time
+    keys = {"BASE_URL": "url", "API_TOKEN": "token", "PROJECT": "project"}
+    if name in keys:
+        return getConfig().get(keys[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class RateController:
+    """
+    AIMD limit on the number of requests in flight.
+    - the limit grows by one after a full window of successes (additive increase)
+    - it is halved on throttling, at most once per cooldown (multiplicative decrease)
+    """
+    def __init__(self, max_concurrency=10, min_concurrency=1, cooldown=1.0):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.cooldown = cooldown
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self.cond:
+            self.in_flight -= 1
+            if throttled:
+                now = time.monotonic()
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+
+def retryAfter(response):
+    # Retry-After in seconds, given either as a number or as an HTTP date
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoffDelay(attempt, response=None, base=0.5, cap=30.0):
+    # Seconds before retry attempt + 1: the server's Retry-After in full when it sent one (retrying
+    # earlier only gets throttled again), otherwise full jitter over an exponential window capped at cap
+    delay = retryAfter(response)
+    if delay is not None:
+        return delay + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class MatrixClient:
+    """
+    Keep-alive HTTP client for the Matrix REST API.
+    - pool_size: max connections kept open per host, also the max concurrency
+    - timeout: (connect, read) timeout in seconds
+    - max_retries: retries on 429/5xx and connection errors, with jittered exponential backoff
+      (capped at backoff_cap), or after the full Retry-After the server asked for
+    - cache: optional ResponseCache consulted before hitting the network
+    """
+    def __init__(self, base_url, token, project, pool_size=10, timeout=(10, 120),
+                 max_retries=5, backoff_base=0.5, backoff_cap=30.0, cache=None):
+        self.base_url = base_url
+        self.cache = cache
+        self.project = project
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.controller = RateController(max_concurrency=pool_size)
+        self.request_count = 0
+        self.lock = threading.Lock()
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": "Token " + token,
+            "Accept-Encoding": "gzip, deflate",
+        })
+
+    def url(self, path):
+        return f"{self.base_url}/{self.project}{path}"
+
+    def backoff(self, attempt, response=None):
+        return backoffDelay(attempt, response, self.backoff_base, self.backoff_cap)
+
+    def get(self, path, params=None, version=None):
+        # version: item version the response belongs to, makes the cache entry immutable
+        if self.cache is not None:
+            key = ResponseCache.key(self.project, path, params, version)
+            body = self.cache.get(key)
+            if profiling.profiler is not None:
+                profiling.profiler.cache(body is not None)
+            if body is not None:
+                return CachedResponse(body)
+            response = self.fetch(path, params)
+            if response is not None and response.status_code == 200:
+                self.cache.put(key, response.text, self.project, path.rsplit('/', 1)[-1], version)
+            return response
+        return self.fetch(path, params)
+
+    def store(self, path, params, version, body):
+        # Body of a versioned response known without requesting it (field value of a folder payload)
+        if self.cache is not None and version is not None:
+            key = ResponseCache.key(self.project, path, params, version)
+            self.cache.put(key, body, self.project, path.rsplit('/', 1)[-1], version, commit=False)
+
+    def uncached(self, requests):
+        # (path, params, version) among requests that the cache can't answer
+        if self.cache is None:
+            return list(requests)
+        keys = {ResponseCache.key(self.project, path, params, version): (path, params, version)
+                for path, params, version in requests}
+        return [keys[key] for key in self.cache.missing(keys)]
+
+    def fetch(self, path, params=None, stream=False):
+        # stream: return before the body is read, the caller reads response.raw and closes it
+        import requests
+        for attempt in range(self.max_retries + 1):
+            response = None
+            self.controller.acquire()
+            throttled = True
+            started = time.perf_counter()
+            try:
+                with self.lock:
+                    self.request_count += 1
+                response = self.session.get(self.url(path), params=params, timeout=self.timeout, stream=stream)
+                throttled = response.status_code in RETRY_STATUS
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                self.controller.release(throttled)
+                if profiling.profiler is not None:
+                    if response is None:
+                        size = 0
+                    elif stream:
+                        size = int(response.headers.get("Content-Length", 0))
+                    else:
+                        size = len(response.content)
+                    status = response.status_code if response is not None else 0
+                    profiling.profiler.request(path.split('/')[1], started, time.perf_counter() - started, size, status)
+            if not throttled or attempt == self.max_retries:
+                return response
+            if stream and response is not None:
+                response.close()
+            time.sleep(self.backoff(attempt, response))
+
+    def close(self):
+        self.session.close()
+
+
+client = None
+
+def getClient(pool_size=10, cache=None):
+    # Shared client, created on first use
+    global client
+    if client is None:
+        settings = getConfig()
+        missing = [key for key in CONFIG_ENV if not settings.get(key)]
+        if missing:
+            raise ValueError("Missing Matrix configuration: " + ", ".join(missing) +
+                             " (config.json, MATRIX_* environment variables or configure())")
+        client = MatrixClient(settings["url"], settings["token"], settings["project"],
+                              pool_size=pool_size, cache=cache)
+    return client
 
 
 def getFieldIdJson(data_json, field):
@@ -34,6 +250,78 @@ def getFieldIdJson(data_json, field):
             return elt["id"]
     return None
 
+
+# Field label -> field ID and folder tree, resolved once per category from /cat
+field_ids = {}
+folder_indexes = {}
+
+def parseCategory(response):
+    # Field label -> field ID and FolderIndex of a /cat response, both empty on error
+    ids = {}
+    index = FolderIndex()
+    if response.status_code == 200:
+        try:
+            with profiling.stage("json"):
+                data_json = loads(response.text)
+            for elt in data_json.get("fieldList", []):
+                ids[elt["label"]] = elt["id"]
+            if "folder" in data_json:
+                index.add(data_json["folder"])
+        except ValueError:
+            print("Expected JSON but got:", response.text[:500])  # print the first 500 chars
+    else:
+        print(f"Error {response.status_code}: {response.text}")
+    return ids, index
+
+
+def loadCategory(category):
+    field_ids[category], folder_indexes[category] = parseCategory(getClient().get(f"/cat/{category}"))
+
+
+def getFieldId(category, field):
+    if category not in field_ids:
+        loadCategory(category)
+    return field_ids[category].get(field)
+
+
+def getFolderIndex(category):
+    if category not in folder_indexes:
+        loadCategory(category)
+    return folder_indexes[category]
+
+
+def getFieldValueFromJson(line, field, raw=False):
+    # Field values embedded in a `fields=1` payload, None if not present
+    field_id = getFieldId(getCategory(line['itemRef']), field)
+    if field_id is None:
+        return None
+    return fieldValFromLine(line, field_id, raw)
+
+
+def fieldValFromLine(line, field_id, raw=False):
+    # raw: value as stored, for JSON fields that are cleaned after parsing (see cleanJson)
+    field_vals = line.get('fieldValList', {}).get('fieldVal', line.get('fieldVal', []))
+    for elt in field_vals:
+        if elt.get('id') == field_id:
+            if raw:
+                return elt.get('value') or ""
+            with profiling.stage("clean_html"):
+                return clean_from_html(elt.get('value'))
+    return None
+
+
+def cleanJson(value):
+    # Clean every string of a parsed JSON field; cleaning the JSON text itself would decode
+    # &quot; and friends into characters that break the JSON syntax
+    if isinstance(value, str):
+        return clean_from_html(value)
+    if isinstance(value, list):
+        return [cleanJson(v) for v in value]
+    if isinstance(value, dict):
+        return {k: cleanJson(v) for k, v in value.items()}
+    return value
+
+
 def extractDataFromFMEA(json_in):
     output = {}
     for element in json_in['factors']:
@@ -53,35 +341,136 @@ def extractDataFromFMEA(json_in):
         
 
 
-def exportItemFromJson(json_in, full=True):
-    export = []
-    
+def collectItemsFromJson(json_in):
+    # Items of a folder tree in display order, excluded (obsolete) folders skipped
+    items = []
     for line in json_in:
         if line['isFolder'] == 1:
-            if "obsolete" not in line['title']:
-                export += exportItemFromJson(line['itemList'], full)
+            if not isExcludedTitle(line['title']):
+                items += collectItemsFromJson(line['itemList'])
         else:
-            item = {}
-            item['ID'] = line['itemRef']
-            item['Title'] = line['title']
-            print(item['ID'] + "  \t" + item['Title'])
-            if full:
-                if 'FMEA' in item['ID']:
-                    fmea_field = getItemField(item['ID'], "FMEA")
-                    fmea_json = json.loads(fmea_field)
-                    fmea = extractDataFromFMEA(fmea_json)
-                    item['item'] = fmea['item']
-                    item['failure'] = fmea['failure']
-                    item['effect'] = fmea['effect']
-                    item['cause'] = fmea['cause']
-                    item['P1'] = fmea['P1']
-                    item['S1'] = fmea['S1']
-                    item['Mitigation'] = getItemField(item['ID'], "Risk Mitigation Comment")
-                else:
-                    item['Description'] = getItemField(item['ID'], "Description")
-                    item['Labels'] = getItemField(item['ID'], "Labels")
-            export.append(item)
-    return export
+            items.append(line)
+    return items
+
+
+def getFieldValue(line, field, bulk=False, raw=False):
+    # In bulk mode read the value out of the folder payload, GET it only when missing.
+    # A value read from the payload is cached as the /field response of that item version.
+    if bulk:
+        value = getFieldValueFromJson(line, field, raw=True)
+        if value is not None:
+            getClient().store(f"/field/{line['itemRef']}", {'field': field}, line.get('version'), value)
+            if raw:
+                return value
+            with profiling.stage("clean_html"):
+                return clean_from_html(value)
+    return getItemField(line['itemRef'], field, line.get('version'), raw)
+
+
+# Fields holding JSON, fetched raw and cleaned string by string once parsed
+JSON_FIELDS = ("FMEA",)
+# Share of listed items missing from the cache above which the fields=1 payload is downloaded
+CACHED_LISTING_MAX_MISSING = 0.1
+
+def itemFields(item_id):
+    # Fields exported for an item, by item type
+    if 'FMEA' in item_id:
+        return ("FMEA", "Risk Mitigation Comment")
+    return ("Description", "Labels")
+
+
+def itemColumns(item_id):
+    # Columns of an exported item (or of the items of a folder), in order, as exportItem builds
+    # them; FMEA rows may add a column per extra weight type
+    if 'FMEA' in item_id:
+        return ["ID", "Title", "item", "failure", "effect", "cause", "P1", "S1", "Mitigation", "P2", "S2"]
+    return ["ID", "Title", "Description", "Labels"]
+
+
+def fieldColumns(item_id, values):
+    # Export columns of an item out of its field values {field: value}
+    if 'FMEA' in item_id:
+        with profiling.stage("fmea"):
+            fmea_json = cleanJson(json.loads(values["FMEA"]))
+            fmea = extractDataFromFMEA(fmea_json)
+            weights = extractWeightsFromFMEA(fmea_json)
+        columns = {'item': fmea['item'], 'failure': fmea['failure'], 'effect': fmea['effect'],
+                   'cause': fmea['cause'], 'P1': weights.get('P1', fmea['P1']), 'S1': weights.get('S1', fmea['S1']),
+                   'Mitigation': values["Risk Mitigation Comment"], 'P2': weights.get('P2', ""), 'S2': weights.get('S2', "")}
+        # Every other weight type (detectability, custom weights, ...) gets a column of its own
+        columns.update((key, value) for key, value in weights.items() if key not in columns)
+        return columns
+    return {'Description': values["Description"], 'Labels': values["Labels"]}
+
+
+def exportItem(line, full=True, bulk=False):
+
+    item = {}
+    item['ID'] = line['itemRef']
+    item['Title'] = line['title']
+    print(item['ID'] + "  \t" + item['Title'])
+    if full:
+        values = {field: getFieldValue(line, field, bulk, field in JSON_FIELDS) for field in itemFields(item['ID'])}
+        item.update(fieldColumns(item['ID'], values))
+    return item
+
+
+def iterItemsFromJson(json_in, full=True, bulk=False, workers=1, previous=None, manifest=None):
+    # Rows of a parsed folder tree, see iterItemsFromLines
+    return iterItemsFromLines(collectItemsFromJson(json_in), full, bulk, workers, previous, manifest)
+
+
+def iterItemsFromLines(lines, full=True, bulk=False, workers=1, previous=None, manifest=None):
+    """
+    Yield one row per item line, in order, as soon as it is fetched. lines may be a
+    generator (streamed folder payload), it is consumed as the rows go.
+    - previous: {item ID: {"version": ..., "row": ...}} from an earlier run, rows of
+      items whose version did not change are reused instead of fetched
+    - manifest: dict filled with the same structure for the current run
+    """
+    previous = previous or {}
+
+    def export(line):
+        known = previous.get(line['itemRef'])
+        version = line.get('version')
+        if known is not None and version is not None and known['version'] == version:
+            return known['row']
+        return exportItem(line, full, bulk)
+
+    def emit(line, row):
+        if manifest is not None:
+            manifest[line['itemRef']] = {'version': line.get('version'), 'row': row}
+        return row
+
+    def resolve(lines):
+        # Resolve field IDs before fanning out so workers share one lookup per category
+        for line in lines:
+            category = getCategory(line['itemRef'])
+            if category not in field_ids:
+                getFieldId(category, None)
+            yield line
+
+    if bulk:
+        lines = resolve(lines)
+    if workers > 1:
+        # Bounded window of in-flight items, consumed in submission order to keep the tree order
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for line in lines:
+                pending.append((line, executor.submit(export, line)))
+                if len(pending) >= workers * 4:
+                    line, future = pending.popleft()
+                    yield emit(line, future.result())
+            while pending:
+                line, future = pending.popleft()
+                yield emit(line, future.result())
+    else:
+        for line in lines:
+            yield emit(line, export(line))
+
+
+def exportItemFromJson(json_in, full=True, bulk=False, workers=1, previous=None, manifest=None):
+    return list(iterItemsFromJson(json_in, full, bulk, workers, previous, manifest))
 
 
 def printRaw(raw):
@@ -95,30 +484,33 @@ def printRaw(raw):
         print(out)
 
 
-def getItemField(item, field):
+def getItemField(item, field, version=None, raw=False):
 
-    headers = {"Authorization": "Token " + API_TOKEN}
-    param = param = {'field':field}
-    url = f"{BASE_URL}/{PROJECT}/field/{item}"
-    response = requests.get(url, headers=headers, params=param)
-    return clean_from_html(response.text)
+    param = {'field':field}
+    response = getClient().get(f"/field/{item}", params=param, version=version)
+    if raw:
+        return response.text
+    with profiling.stage("clean_html"):
+        return clean_from_html(response.text)
 
 
 def getFolderName(item):
 
-    headers = {"Authorization": "Token " + API_TOKEN}
-    url = f"{BASE_URL}/{PROJECT}/item/{item}"
-    response = requests.get(url, headers=headers, params={})
+    # Taken from the category folder index, the item itself is only fetched for folders outside of it
+    title = getFolderIndex(getCategory(item)).title(item)
+    if title is not None:
+        return title
+    response = getClient().get(f"/item/{item}")
     data_json = json.loads(response.text)
     return data_json['title']
 
 
 def getMatrixItems(item_type, full=True):
 
-    url = f"{BASE_URL}/{PROJECT}/cat/{item_type}"
-    print(url)
-    headers = {"Authorization": "Token " + API_TOKEN}
-    response = requests.get(url, headers=headers)
+    raw = []
+    path = f"/cat/{item_type}"
+    print(getClient().url(path))
+    response = getClient().get(path)
     
     if response.status_code == 200:
         try:
@@ -130,23 +522,127 @@ def getMatrixItems(item_type, full=True):
         print(f"Error {response.status_code}: {response.text}")
     return raw
 
-def getMatrixItemsFromFolder(folder_id):
+def getFolderJson(folder_id, fields=True):
+    # Folder tree of folder_id, with the field values of every item when fields is set.
+    # Only the listing is cached, the values of a fields=1 payload are cached per item version.
+    path = f"/item/{folder_id}"
+    print(getClient().url(path))
+    if fields:
+        response = getClient().fetch(path, params={'children':'yes', 'fields':1})
+    else:
+        response = getClient().get(path, params={'children':'yes'})
 
-    url = f"{BASE_URL}/{PROJECT}/item/{folder_id}"
-    print(url)
-    headers = {"Authorization": "Token " + API_TOKEN}
-    param = {'children':'yes', 'fields':1}
-    response = requests.get(url, headers=headers, params=param)
-    
     if response.status_code == 200:
         try:
-            data_json = json.loads(response.text)
-            raw = exportItemFromJson(data_json['itemList'], True)
+            with profiling.stage("json"):
+                return loads(response.text)
         except ValueError: 
             print("Expected JSON but got:", response.text[:500])  # print the first 500 chars
     else:
         print(f"Error {response.status_code}: {response.text}")
-    return raw
+    return None
+
+
+def getFolderTree(folder_id):
+    """
+    Folder tree for a full export and whether its items carry their field values (bulk).
+    When the cache holds the fields of nearly every listed item version, the listing is
+    enough: unchanged items are read from the cache and the few others fetched one by one.
+    Otherwise the fields=1 payload is downloaded.
+    """
+    client = getClient()
+    if client.cache is not None and not client.cache.refresh:
+        data_json = getFolderJson(folder_id, fields=False)
+        if data_json is None:
+            return None, True
+        lines = collectItemsFromJson(data_json['itemList'])
+        requests = [(f"/field/{line['itemRef']}", {'field': field}, line.get('version'))
+                    for line in lines for field in itemFields(line['itemRef'])]
+        missing = {path for path, _, _ in client.uncached(requests)}
+        if len(missing) <= CACHED_LISTING_MAX_MISSING * len(lines):
+            return data_json, False
+    return getFolderJson(folder_id, fields=True), True
+
+
+def iterFolderLines(folder_id, fields=True):
+    """
+    Item lines of a folder tree parsed while the response is downloaded, one at a time, so
+    memory does not grow with the folder size (see json_stream.iterFolderItems). Not cached.
+    """
+    path = f"/item/{folder_id}"
+    print(getClient().url(path))
+    param = {'children':'yes', 'fields':1} if fields else {'children':'yes'}
+    response = getClient().fetch(path, params=param, stream=True)
+    if response.status_code != 200:
+        print(f"Error {response.status_code}: {response.text}")
+        return
+    # Let urllib3 inflate the gzip body while it is read
+    response.raw.decode_content = True
+    try:
+        yield from iterFolderItems(response.raw)
+    finally:
+        response.close()
+
+
+def iterMatrixItemsFromFolder(folder_id, workers=1, previous=None, manifest=None, stream=False):
+
+    # With rows from a previous run only the listing is needed, changed items are fetched one by one
+    bulk = not previous
+    start = time.perf_counter()
+    requests_before = getClient().request_count
+    if stream:
+        lines = iterFolderLines(folder_id, fields=bulk)
+    else:
+        if bulk:
+            data_json, bulk = getFolderTree(folder_id)
+        else:
+            data_json = getFolderJson(folder_id, fields=False)
+        if data_json is None:
+            return
+        lines = collectItemsFromJson(data_json['itemList'])
+    yield from iterItemsFromLines(lines, True, bulk=bulk, workers=workers,
+                                  previous=previous, manifest=manifest)
+    if getClient().cache is not None:
+        # Values stored from the payload, written once per folder
+        getClient().cache.flush()
+    print(f"{getClient().request_count - requests_before} requests in {time.perf_counter() - start:.2f} s")
+
+
+def getMatrixItemsFromFolder(folder_id, workers=1, previous=None, manifest=None, stream=False):
+    return list(iterMatrixItemsFromFolder(folder_id, workers, previous, manifest, stream))
+
+def getItemTableFromFolder(folder_id, workers=1, previous=None, manifest=None, stream=False):
+    # Same rows as getMatrixItemsFromFolder, stored by column (item_table.ItemTable)
+    return ItemTable.fromRows(iterMatrixItemsFromFolder(folder_id, workers, previous, manifest, stream))
+
+
+def saveSnapshot(path, folder_ids, workers=1, refresh=True):
+    """
+    Crawl each root folder into the snapshot store at path (see snapshot.Snapshot).
+    - refresh: reuse the stored rows of items whose version did not change, only the
+      folder listings and the changed items are fetched
+    """
+    from snapshot import Snapshot
+
+    snapshot = Snapshot(path)
+    for folder_id in folder_ids:
+        previous = snapshot.previous(folder_id) if refresh else {}
+        bulk = not previous
+        start = time.perf_counter()
+        requests_before = getClient().request_count
+        data_json = getFolderJson(folder_id, fields=bulk)
+        if data_json is None:
+            continue
+        rows = iterItemsFromJson(data_json['itemList'], True, bulk=bulk, workers=workers, previous=previous)
+        count = snapshot.save(folder_id, data_json, rows)
+        print(f"{folder_id}: {count} items, {getClient().request_count - requests_before} requests in {time.perf_counter() - start:.2f} s")
+    snapshot.close()
+
+
+def getFmeaTableFromFolder(folder_id, workers=1):
+    # All FMEA items of a folder as one fmea.FmeaTable, built from their exported rows
+    from fmea import FmeaTable
+    return FmeaTable.fromRows(row for row in iterMatrixItemsFromFolder(folder_id, workers) if 'FMEA' in row['ID'])
 
 def getWorkItems(item_type):
     raw = getMatrixItems(item_type, True)
@@ -154,10 +650,8 @@ def getWorkItems(item_type):
 
 def getTest(scheme, param):
 
-    url = f"{BASE_URL}/{PROJECT}{scheme}"
-    print(url)
-    headers = {"Authorization": "Token " + API_TOKEN}
-    response = requests.get(url, headers=headers, params=param)
+    print(getClient().url(scheme))
+    response = getClient().get(scheme, params=param)
     
     if response.status_code == 200:
         try:
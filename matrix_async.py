@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import matrix_api as api
+import profiling
+from html_clean import clean_from_html
+from json_stream import loads
+
+
+class AsyncResponse:
+    """Status, headers and body of a finished request, the body already read."""
+    def __init__(self, status_code, text, headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+
+class AsyncMatrixClient:
+    """
+    asyncio counterpart of matrix_api for services running an event loop (needs aiohttp).
+    One aiohttp session is shared by every call, so connections are kept open and reused.
+    - pool_size: connections kept open, also the max number of requests in flight
+    - timeout: seconds per request attempt
+    - max_retries: retries on 429/5xx, timeouts and connection errors, with jittered exponential backoff
+      (capped at backoff_cap), or after the full Retry-After the server asked for
+    Use it as `async with AsyncMatrixClient(...) as client:`. Cancelling a task cancels its
+    requests, the batch helpers cancel the remaining requests when one of them fails.
+    """
+    def __init__(self, base_url, token, project, pool_size=20, timeout=120,
+                 max_retries=5, backoff_base=0.5, backoff_cap=30.0):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("The async client needs aiohttp: pip install aiohttp")
+        self.aiohttp = aiohttp
+        self.base_url = base_url
+        self.token = token
+        self.project = project
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.request_count = 0
+        self.session = None
+        self.semaphore = None
+        self.categories = {}    # category -> task resolving (field IDs, FolderIndex), shared by concurrent callers
+
+    @classmethod
+    def fromConfig(cls, **kwargs):
+        # Same settings as matrix_api.getClient: config.json, MATRIX_* variables or api.configure()
+        settings = api.getConfig()
+        return cls(settings["url"], settings["token"], settings["project"], **kwargs)
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = self.aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = self.aiohttp.ClientSession(
+                connector=connector, timeout=self.aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Authorization": "Token " + self.token, "Accept-Encoding": "gzip, deflate"})
+            self.semaphore = asyncio.Semaphore(self.pool_size)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def url(self, path):
+        return f"{self.base_url}/{self.project}{path}"
+
+    def backoff(self, attempt, response=None):
+        return api.backoffDelay(attempt, response, self.backoff_base, self.backoff_cap)
+
+    async def get(self, path, params=None):
+        await self.open()
+        for attempt in range(self.max_retries + 1):
+            response = None
+            started = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    self.request_count += 1
+                    async with self.session.get(self.url(path), params=params) as raw:
+                        response = AsyncResponse(raw.status, await raw.text(), raw.headers)
+            except (self.aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                if profiling.profiler is not None:
+                    size = len(response.text) if response is not None else 0
+                    status = response.status_code if response is not None else 0
+                    profiling.profiler.request(path.split('/')[1], started, time.perf_counter() - started, size, status)
+            if response is not None and (response.status_code not in api.RETRY_STATUS or attempt == self.max_retries):
+                return response
+            await asyncio.sleep(self.backoff(attempt, response))
+
+    async def loadCategory(self, category):
+        return api.parseCategory(await self.get(f"/cat/{category}"))
+
+    async def category(self, category):
+        # One /cat request per category, whatever the number of concurrent callers
+        if category not in self.categories:
+            self.categories[category] = asyncio.ensure_future(self.loadCategory(category))
+        try:
+            return await asyncio.shield(self.categories[category])
+        except Exception:
+            self.categories.pop(category, None)
+            raise
+
+    async def getFieldId(self, category, field):
+        ids, _ = await self.category(category)
+        return ids.get(field)
+
+    async def getFolderIndex(self, category):
+        _, index = await self.category(category)
+        return index
+
+    async def getItemField(self, item, field, raw=False):
+        response = await self.get(f"/field/{item}", params={'field': field})
+        return response.text if raw else clean_from_html(response.text)
+
+    async def getFolderName(self, item):
+        index = await self.getFolderIndex(api.getCategory(item))
+        title = index.title(item)
+        if title is not None:
+            return title
+        response = await self.get(f"/item/{item}")
+        return loads(response.text)['title']
+
+    async def getFolderJson(self, folder_id, fields=True):
+        param = {'children': 'yes', 'fields': 1} if fields else {'children': 'yes'}
+        response = await self.get(f"/item/{folder_id}", params=param)
+        if response.status_code != 200:
+            print(f"Error {response.status_code}: {response.text}")
+            return None
+        return loads(response.text)
+
+    async def fieldValue(self, line, field):
+        # From the folder payload, GET only when missing
+        raw = field in api.JSON_FIELDS
+        field_id = await self.getFieldId(api.getCategory(line['itemRef']), field)
+        value = api.fieldValFromLine(line, field_id, raw) if field_id is not None else None
+        if value is None:
+            value = await self.getItemField(line['itemRef'], field, raw)
+        return value
+
+    async def exportItem(self, line, full=True):
+        item = {'ID': line['itemRef'], 'Title': line['title']}
+        if full:
+            fields = api.itemFields(item['ID'])
+            values = await asyncio.gather(*(self.fieldValue(line, field) for field in fields))
+            item.update(api.fieldColumns(item['ID'], dict(zip(fields, values))))
+        return item
+
+    async def getMatrixItemsFromFolder(self, folder_id, full=True, timeout=None):
+        """Rows of every item of a folder tree, in tree order, items fetched concurrently."""
+        async def crawl():
+            data_json = await self.getFolderJson(folder_id)
+            if data_json is None:
+                return []
+            lines = api.collectItemsFromJson(data_json['itemList'])
+            return await gather([self.exportItem(line, full) for line in lines])
+        return await asyncio.wait_for(crawl(), timeout)
+
+    async def getFields(self, items, fields, timeout=None):
+        """{item: {field: value}} for every item and field, fetched concurrently."""
+        items = list(items)
+        fields = list(fields)
+        values = await asyncio.wait_for(
+            gather([self.getItemField(item, field) for item in items for field in fields]), timeout)
+        return {item: dict(zip(fields, values[i * len(fields):(i + 1) * len(fields)]))
+                for i, item in enumerate(items)}
+
+    async def getFolderNames(self, folder_ids, timeout=None):
+        folder_ids = list(folder_ids)
+        names = await asyncio.wait_for(gather([self.getFolderName(ref) for ref in folder_ids]), timeout)
+        return dict(zip(folder_ids, names))
+
+
+async def gather(coroutines):
+    # asyncio.gather that cancels the coroutines still running when one fails
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
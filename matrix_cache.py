@@ -0,0 +1,173 @@
+import atexit
+import sqlite3
+import threading
+import time
+
+
+class CachedResponse:
+    """Stand-in for requests.Response when the body comes from the cache."""
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+        self.headers = {}
+
+
+class ResponseCache:
+    """
+    On-disk SQLite cache of Matrix REST responses.
+    - path: SQLite file
+    - max_bytes: size cap, least recently used entries are evicted first
+    - ttl: seconds before an unversioned entry (folder listing, category) expires;
+      entries keyed by an item version never go stale
+    - refresh: ignore cached entries but store the fresh responses
+    Hits only record their access time in memory, written in batches (every flush_every hits,
+    before an eviction and at exit), so a hit costs one SELECT and no commit. Entries put with
+    commit=False are buffered in memory and written together in one short transaction (every
+    flush_every entries, on flush() and at exit): no write transaction stays open between calls,
+    so other processes can share the file.
+    """
+    def __init__(self, path="matrix_cache.sqlite", max_bytes=256 * 1024 * 1024, ttl=300, refresh=False,
+                 flush_every=1000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.refresh = refresh
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self.accessed = {}      # key -> access time of the hits not written yet
+        self.buffered = {}      # key -> row of the entries put with commit=False, not written yet
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: commits don't wait for a full fsync and readers don't block the writer
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, project TEXT, item TEXT, version TEXT,
+            body TEXT, size INTEGER, created REAL, accessed REAL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.conn.commit()
+        self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        atexit.register(self.flush)
+
+    @staticmethod
+    def key(project, path, params=None, version=None):
+        query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return f"{project}{path}?{query}@{version or ''}"
+
+    def get(self, key):
+        if self.refresh:
+            self.misses += 1
+            return None
+        with self.lock:
+            if key in self.buffered:
+                self.hits += 1
+                return self.buffered[key][4]
+            row = self.conn.execute("SELECT body, version, created, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            body, version, created, size = row
+            now = time.time()
+            if version is None and now - created > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                self.accessed.pop(key, None)
+                self.size -= size
+                self.misses += 1
+                return None
+            self.accessed[key] = now
+            if len(self.accessed) >= self.flush_every:
+                self.writeAccessed()
+                self.conn.commit()
+            self.hits += 1
+            return body
+
+    def missing(self, keys):
+        # Keys without a cached entry, in one query per 500 keys
+        keys = list(keys)
+        if self.refresh:
+            return keys
+        with self.lock:
+            found = set(self.buffered)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                query = "SELECT key FROM responses WHERE key IN (" + ",".join("?" * len(chunk)) + ")"
+                found.update(key for key, in self.conn.execute(query, chunk))
+        return [key for key in keys if key not in found]
+
+    def put(self, key, body, project=None, item=None, version=None, commit=True):
+        size = len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        entry = (key, project, item, None if version is None else str(version), body, size, now, now)
+        with self.lock:
+            self.buffered[key] = entry
+            if commit or len(self.buffered) >= self.flush_every:
+                self.writeBuffered()
+                self.conn.commit()
+
+    def writeBuffered(self):
+        # Buffered entries to the table, committed by the caller
+        if not self.buffered:
+            return
+        entries = list(self.buffered.values())
+        keys = list(self.buffered)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            query = "SELECT COALESCE(SUM(size), 0) FROM responses WHERE key IN (" + ",".join("?" * len(chunk)) + ")"
+            self.size -= self.conn.execute(query, chunk).fetchone()[0]
+        self.conn.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entries)
+        for key in keys:
+            self.accessed.pop(key, None)
+        self.size += sum(entry[5] for entry in entries)
+        self.buffered = {}
+        self.evict()
+
+    def writeAccessed(self):
+        # Pending access times to the table, committed by the caller
+        if self.accessed:
+            self.conn.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                  [(accessed, key) for key, accessed in self.accessed.items()])
+            self.accessed = {}
+
+    def flush(self):
+        # Buffered entries and access times to disk; best effort, the cache is only a cache
+        with self.lock:
+            if self.accessed or self.buffered:
+                try:
+                    self.writeBuffered()
+                    self.writeAccessed()
+                    self.conn.commit()
+                except sqlite3.OperationalError as e:
+                    self.conn.rollback()
+                    self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                    print(f"Response cache not written: {e}")
+
+    def evict(self):
+        # Drop least recently used entries until we are back under the cap
+        if self.size > self.max_bytes:
+            self.writeAccessed()
+        while self.size > self.max_bytes:
+            rows = self.conn.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 100").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                if self.size <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+            self.accessed = {}
+            self.buffered = {}
+            self.size = 0
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self.conn.close()
@@ -1,10 +1,20 @@
 #!/usr/bin/python3
 import matrix_api as api
 import html_export as export
+from matrix_cache import ResponseCache
+from html_clean import clean_from_html
+from table_writers import WRITERS, warnUnknownKeys
+import traceability
+from traceability import TraceIndex
+from snapshot import Snapshot
+from folder_index import EXCLUDED_TITLES
+from item_table import ItemTable
+from weights import RISK_THRESHOLDS, rowWeights
+import profiling
 
 import os
-from lxml import etree
-import pandas as pd
+import json
+import itertools
 import argparse
 import re
 
@@ -14,57 +24,72 @@ red_light = '#ffcccc'
 grey_light = '#d3d3d3'
 white = '#FFFFFF'
 
-req_id_regexp = r"\s*((?:SDD|SRS)[- _,.]*0*\d{1,6})"
-
-
-def clean_from_html(input):
-    if input is None:
-        return ""
-    p = re.compile(r'<.*?>')
-    output = p.sub('', input)
-    output = output.replace('&nbsp;', '')
-    output = output.replace('&deg;', '°')
-    output = output.replace('&lt;', '<')
-    output = output.replace('&gt;', '>')
-    output = output.replace('&ldquo;', '\"')
-    output = output.replace('&rdquo;', '\"')
-    output = output.replace('&#39;', '\'')
-    output = output.replace('&quot;', '\'')
-    output = output.replace('&micro;', 'u')
-    return output
+# Defined in traceability, still importable from here
+req_id_regexp = traceability.req_id_regexp
+
+
+# (color, substrings, exact values), by priority: the first rule that matches a value wins
+COLOR_RULES = [
+    (red_light,
+     ["5-Catastrophic", "5-Frequent", "Unacceptable(", "(FAIL)"],
+     ["Error", "Fail", ""]),
+    (yellow_light,
+     ["4-Significant", "3-Moderate", "4-Possible", "3-Unlikely", "Review(", "(SKIPPED)"],
+     ["Review", "Skipped"]),
+    (green_light,
+     ["2-Minor", "1-Negligible", "2-Rare", "1-Improbable", "Acceptable(", "(PASS)"],
+     ["Approved", "Published", "Pass"]),
+    (grey_light,
+     [],
+     ["New", "Reopen", "Not in execution", "Not Completed"]),
+]
+
+
+class ColorRules:
+    """
+    Color rules compiled into one exact-match dict and one combined substring matcher.
+    The matcher is a lookahead at every position, with substrings ordered by rule priority,
+    so overlapping matches ("Unacceptable(" / "Acceptable(") still resolve to the first rule.
+    """
+    def __init__(self, rules, default=white):
+        self.colors = [color for color, _, _ in rules]
+        self.default = default
+        self.exact = {}
+        self.contains = {}
+        for priority, (color, contains, equals) in enumerate(rules):
+            for value in equals:
+                self.exact.setdefault(value, priority)
+            for value in contains:
+                self.contains.setdefault(value, priority)
+        ordered = sorted(self.contains, key=lambda value: (self.contains[value], -len(value)))
+        self.pattern = re.compile('(?=(' + '|'.join(map(re.escape, ordered)) + '))') if ordered else None
+        self.memo = {}
+
+    def color(self, value):
+        color = self.memo.get(value)
+        if color is None:
+            best = self.exact.get(value, len(self.colors))
+            if self.pattern is not None:
+                for match in self.pattern.finditer(value):
+                    best = min(best, self.contains[match.group(1)])
+                    if best == 0:
+                        break
+            color = self.colors[best] if best < len(self.colors) else self.default
+            if len(self.memo) < 100000:
+                self.memo[value] = color
+        return color
+
+    def color_column(self, values):
+        # Resolve each distinct value once, then map the whole column
+        colors = {value: self.color(value) for value in set(values)}
+        return [colors[value] for value in values]
+
+
+color_rules = ColorRules(COLOR_RULES)
 
 
 def colorize(value):
-    if ("5-Catastrophic" in value 
-        or "5-Frequent" in value 
-        or "Unacceptable(" in value
-        or "(FAIL)" in value
-        or "Error" == value
-        or "Fail" == value
-        or '' == value):
-        return red_light
-    elif ("4-Significant" in value or "3-Moderate" in value 
-        or "4-Possible" in value or "3-Unlikely" in value
-        or "Review(" in value
-        or "Review" == value
-        or "(SKIPPED)" in value
-        or "Skipped" == value):
-        return yellow_light
-    elif ("2-Minor" in value or "1-Negligible" in value 
-        or "2-Rare" in value or "1-Improbable" in value
-        or "Acceptable(" in value
-        or "Approved" == value
-        or "Published" == value
-        or "(PASS)" in value
-        or "Pass" == value):
-        return green_light
-    elif ("New" == value
-          or "Reopen" == value
-          or "Not in execution" == value
-          or "Not Completed" == value):
-        return grey_light
-    else:
-        return white
+    return color_rules.color(value)
     
 
 def create_table_around(title):
@@ -76,6 +101,7 @@ def create_table_around(title):
 
 
 def table_as_html(table_in, table_title):
+    from lxml import etree
     root = etree.Element('html')
     table = etree.SubElement(root, 'table')
     table.set('border', "1")
@@ -95,25 +121,139 @@ def table_as_html(table_in, table_title):
         th.set("bgcolor", grey_light)
     tbody = etree.SubElement(table, 'tbody')
     
-    for line in table_in:
-        print(line)
+    # The cleaned text is what ends up in the <td>, so it is also what gets colored
+    values = [[clean_from_html(line[key]) for key in line] for line in table_in]
+    colors = iter(color_rules.color_column([value for line in values for value in line]))
+    for line in values:
         tr = etree.SubElement(tbody, 'tr')
-        for key in line:
-            value = clean_from_html(line[key])
-            etree.SubElement(tr, 'td').text = value
-        for td in tr:
-            text = (etree.tostring(td)).decode('utf-8')
-            text = clean_from_html(text)
-            td.set('bgcolor', colorize(text))
+        for value in line:
+            td = etree.SubElement(tr, 'td')
+            td.text = value
+            td.set('bgcolor', next(colors))
     output = etree.tostring(root).decode("utf-8")
 
     return output
 
 def export_xls(data, xls_file):
+    import pandas as pd
     df = pd.DataFrame(data)
     df.to_excel(xls_file, index=False)
 
 
+def export_rows(rows, output_filename, title, virtual=False, formats=("xlsx",), trace=None, columns=()):
+    # Stream the rows into the HTML writer and one writer per format as they come out of the crawl
+    # rows: iterable of dicts, or an ItemTable whose value lists go to the writers without dicts
+    # trace: optional TraceIndex fed with every row
+    # columns: expected columns (api.itemColumns), added after those of the first row when it lacks them
+    if isinstance(rows, ItemTable):
+        if not len(rows):
+            raise ValueError("No item exported")
+        columns = rows.columns
+    else:
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            raise ValueError("No item exported")
+        columns = list(dict.fromkeys(itertools.chain(first.keys(), columns)))
+    html_writer = export.VirtualTableWriter if virtual else export.InteractiveTableWriter
+    writers = [html_writer(output_filename + '.html', columns, title)]
+    for name in formats:
+        writer, extension = WRITERS[name]
+        writers.append(writer(output_filename + extension, columns))
+    stages = ["write " + type(writer).__name__ for writer in writers]
+    if isinstance(rows, ItemTable):
+        for values in rows.iterValues():
+            if trace is not None:
+                with profiling.stage("trace"):
+                    trace.add(dict(zip(columns, values)))
+            for writer, stage in zip(writers, stages):
+                with profiling.stage(stage):
+                    writer.writeValues(values)
+    else:
+        for row in warnUnknownKeys(itertools.chain([first], rows), columns):
+            if trace is not None:
+                with profiling.stage("trace"):
+                    trace.add(row)
+            for writer, stage in zip(writers, stages):
+                with profiling.stage(stage):
+                    writer.write(row)
+    for writer, stage in zip(writers, stages):
+        with profiling.stage(stage):
+            writer.close()
+
+
+def with_path(rows, index):
+    # Folder path column right after the title, looked up in the folder index
+    for row in rows:
+        out = {"ID": row["ID"], "Title": row.get("Title"), "Path": index.path(row["ID"]) or ""}
+        out.update(row)
+        yield out
+
+
+def export_trace(trace, output_filename, title):
+    matrix = trace.trace_matrix()
+    issues = trace.issues()
+    print(f"\n### {len(matrix)} referenced requirements, {len(trace.orphans())} orphan references, "
+          f"{len(trace.uncovered())} uncovered requirements\n")
+    unchecked = trace.unchecked()
+    if unchecked:
+        print("### Orphans not checked for " + ", ".join(unchecked) + ": none of their folders was scanned (see --trace_folder)\n")
+    if matrix:
+        export_rows(matrix, output_filename + ".trace", title + " - trace matrix", formats=("csv",))
+    if issues:
+        export_rows(issues, output_filename + ".trace_issues", title + " - orphans and uncovered", formats=("csv",))
+
+
+def keep_weights(rows, kept):
+    # Pass the rows through, appending the FMEA ones to kept for export_risk
+    for row in rows:
+        if 'FMEA' in row['ID']:
+            kept.append(dict(rowWeights(row), ID=row['ID']))
+        yield row
+
+
+def export_risk(rows, output_filename, thresholds=RISK_THRESHOLDS):
+    # rows: the FMEA rows already exported, nothing is fetched again
+    from fmea import FmeaTable, formatRiskMatrix
+    from table_writers import CsvWriter
+    table = FmeaTable.fromRows(rows, thresholds)
+    if not len(table):
+        print("\n### No FMEA item exported")
+        return
+    summary = table.summary()
+    print("\n" + formatRiskMatrix(summary["matrix_before"], "### Risk matrix before mitigation"))
+    print("\n" + formatRiskMatrix(summary["matrix_after"], "### Risk matrix after mitigation"))
+    rows = table.rows()
+    first = next(rows)
+    writer = CsvWriter(output_filename + ".risk.csv", list(first.keys()))
+    for row in itertools.chain([first], rows):
+        writer.write(row)
+    writer.close()
+
+
+def load_manifest(path, folder_id):
+    # Item ID -> {"version", "row"} stored by the previous incremental run of this folder
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("folder") != folder_id:
+        return {}
+    return manifest.get("items", {})
+
+
+def save_manifest(path, folder_id, items):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"folder": folder_id, "items": items}, f)
+
+
+def delta_report(previous, current):
+    added = [k for k in current if k not in previous]
+    deleted = [k for k in previous if k not in current]
+    changed = [k for k in current if k in previous and current[k]['version'] != previous[k]['version']]
+    return {"added": added, "changed": changed, "deleted": deleted}
+
+
 def main():   
 
     # F-FMEA-2 Implant Software
@@ -123,14 +263,98 @@ def main():
     parser.add_argument("-o", "--output_filename", required=False, type=str, default="output", help="HTML format, default is \'output.html\'")
     parser.add_argument("-f", "--folder_id", required=True, type=str, default='F-PREQ-16', help="Folder ID from which items will be exported")
     parser.add_argument("-t", "--title", required=True, type=str, default='', help="Table tile")
+    parser.add_argument("-w", "--workers", required=False, type=int, default=1, help="Number of items fetched in parallel, default is 1")
+    parser.add_argument("--cache_file", required=False, type=str, default="matrix_cache.sqlite", help="Response cache, default is \'matrix_cache.sqlite\'")
+    parser.add_argument("--no-cache", dest="no_cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses and store fresh ones")
+    parser.add_argument("--format", required=False, type=str, default="xlsx", help="Table files written next to the HTML, comma separated among " + ", ".join(WRITERS) + ", default is \'xlsx\'")
+    parser.add_argument("--virtual", action="store_true", help="HTML table embedded as JSON, only visible rows rendered (large exports)")
+    parser.add_argument("--profile", action="store_true", help="Print requests, latencies, cache hit rate and time per stage")
+    parser.add_argument("--profile_out", required=False, type=str, default=None, help="With --profile, also write the profile to this file")
+    parser.add_argument("--profile_format", required=False, choices=["json", "chrome"], default="json", help="Profile file format, \'chrome\' for chrome://tracing, default is \'json\'")
+    parser.add_argument("--trace", action="store_true", help="Index SRS/SDD references, write \'<output>.trace.html/.csv\' and \'<output>.trace_issues.html/.csv\'")
+    parser.add_argument("--trace_folder", required=False, type=str, action="append", default=[], help="With --trace, also scan this folder (not exported), e.g. the SRS/SDD folders, repeatable")
+    parser.add_argument("--risk_matrix", action="store_true", help="Print the FMEA risk matrices and write RPN/risk levels to \'<output>.risk.csv\'")
+    parser.add_argument("--risk_thresholds", required=False, type=str, default=",".join(str(t) for t in RISK_THRESHOLDS), help="With --risk_matrix, highest RPN of the Acceptable and Review levels, default is \'" + ",".join(str(t) for t in RISK_THRESHOLDS) + "\'")
+    parser.add_argument("--incremental", action="store_true", help="Only refetch items changed since the last run, see \'<output>.manifest.json\'")
+    parser.add_argument("--delta", action="store_true", help="With --incremental, write added/changed/deleted items to \'<output>.delta.json\'")
+    parser.add_argument("--path", action="store_true", help="Add a Path column with the folder path of each item")
+    parser.add_argument("--exclude", required=False, type=str, action="append", default=[], help="Also skip folders whose title contains this text, repeatable, \'obsolete\' is always skipped")
+    parser.add_argument("--stream", action="store_true", help="Parse the folder payload while it downloads, memory stays flat on huge folders (needs ijson)")
+    parser.add_argument("--snapshot", required=False, type=str, default=None, help="Export from this snapshot file (see snapshot.py) instead of the Matrix server, not with --incremental or --stream")
     args = parser.parse_args()
+    formats = [name.strip() for name in args.format.split(",") if name.strip()]
+    for name in formats:
+        if name not in WRITERS:
+            parser.error(f"unknown format '{name}', expected one of: " + ", ".join(WRITERS))
+    try:
+        thresholds = tuple(int(t) for t in args.risk_thresholds.split(","))
+    except ValueError:
+        thresholds = ()
+    if len(thresholds) != 2 or thresholds[0] > thresholds[1]:
+        parser.error(f"--risk_thresholds expects two increasing numbers such as '4,9', got '{args.risk_thresholds}'")
+    if args.snapshot and (args.incremental or args.stream):
+        parser.error("--snapshot reads the rows from the snapshot file, it can't be combined with --incremental or --stream")
     
-    folder_name = api.getFolderName(args.folder_id)
+    EXCLUDED_TITLES.extend(args.exclude)
+    if args.profile:
+        profiling.enable()
+    if args.snapshot:
+        # Offline export, rows come from the snapshot and nothing is fetched
+        snapshot = Snapshot(args.snapshot)
+        folder_name = snapshot.folderTitle(args.folder_id)
+        if folder_name is None:
+            print(f"Folder {args.folder_id} is not in the snapshot {args.snapshot}")
+            return
+    else:
+        cache = None if args.no_cache else ResponseCache(args.cache_file, refresh=args.refresh)
+        api.getClient(pool_size=max(10, args.workers), cache=cache)
+        folder_name = api.getFolderName(args.folder_id)
     print("\n### Exporting from folder: " + args.folder_id + " " + folder_name + " ....\n")
-    rows = api.getMatrixItemsFromFolder(args.folder_id)
-    export.generate_interactive_html_table(rows, out_path=args.output_filename + '.html', title=args.title)
-    filename = args.output_filename + ".xlsx"
-    export_xls(rows, filename)
+    trace = TraceIndex() if args.trace else None
+    index = None
+    if args.snapshot:
+        index = snapshot.folderIndex()
+        rows = snapshot.query(folder=args.folder_id, where=lambda row: not index.isExcluded(row["ID"]))
+    elif args.incremental:
+        manifest_file = args.output_filename + ".manifest.json"
+        previous = load_manifest(manifest_file, args.folder_id)
+        manifest = {}
+        rows = api.iterMatrixItemsFromFolder(args.folder_id, workers=args.workers, previous=previous, manifest=manifest,
+                                              stream=args.stream)
+    else:
+        rows = api.iterMatrixItemsFromFolder(args.folder_id, workers=args.workers, stream=args.stream)
+    if args.path:
+        rows = with_path(rows, index or api.getFolderIndex(api.getCategory(args.folder_id)))
+    risk_rows = []
+    if args.risk_matrix:
+        rows = keep_weights(rows, risk_rows)
+    export_rows(rows, args.output_filename, args.title, args.virtual, formats, trace, api.itemColumns(args.folder_id))
+    if args.incremental:
+        save_manifest(manifest_file, args.folder_id, manifest)
+        delta = delta_report(previous, manifest)
+        print(f"\n### {len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['deleted'])} deleted\n")
+        if args.delta:
+            with open(args.output_filename + ".delta.json", "w", encoding="utf-8") as f:
+                json.dump(delta, f, indent=4)
+    if trace is not None:
+        for folder_id in args.trace_folder:
+            with profiling.stage("trace"):
+                if args.snapshot:
+                    trace_rows = snapshot.query(folder=folder_id, where=lambda row: not index.isExcluded(row["ID"]))
+                else:
+                    trace_rows = api.iterMatrixItemsFromFolder(folder_id, workers=args.workers, stream=args.stream)
+                for row in trace_rows:
+                    trace.add(row)
+        export_trace(trace, args.output_filename, args.title)
+    if args.risk_matrix:
+        export_risk(risk_rows, args.output_filename, thresholds)
+    if args.snapshot:
+        snapshot.close()
+    if args.profile:
+        print(profiling.profiler.summary())
+        if args.profile_out:
+            profiling.profiler.write(args.profile_out, args.profile_format)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+MAX_EVENTS = 200000
+
+
+class Profiler:
+    """
+    Per-endpoint request statistics, cache hit rate and time per pipeline stage.
+    Stage times are summed over threads, so with --workers they can exceed the wall time.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.endpoints = {}
+        self.stages = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.events = []
+
+    def event(self, name, category, start, elapsed):
+        # Chrome trace "complete" event, timestamps in microseconds from the profiler start
+        if len(self.events) < MAX_EVENTS:
+            self.events.append({"name": name, "cat": category, "ph": "X", "pid": 1,
+                                "tid": threading.get_ident(), "ts": (start - self.start) * 1e6,
+                                "dur": elapsed * 1e6})
+
+    def request(self, endpoint, start, elapsed, size, status):
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {"requests": 0, "errors": 0, "bytes": 0, "latencies": []})
+            stats["requests"] += 1
+            stats["errors"] += status != 200
+            stats["bytes"] += size
+            stats["latencies"].append(elapsed)
+            self.event(f"GET /{endpoint}", "request", start, elapsed)
+
+    def cache(self, hit):
+        with self.lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                stats = self.stages.setdefault(name, {"calls": 0, "total": 0.0})
+                stats["calls"] += 1
+                stats["total"] += elapsed
+                self.event(name, "stage", start, elapsed)
+
+    def to_json(self):
+        with self.lock:
+            endpoints = {}
+            for name, stats in self.endpoints.items():
+                latencies = sorted(stats["latencies"])
+                histogram = [0] * len(LATENCY_BUCKETS)
+                for latency in latencies:
+                    histogram[next(i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound)] += 1
+                endpoints[name] = {
+                    "requests": stats["requests"], "errors": stats["errors"], "bytes": stats["bytes"],
+                    "total": sum(latencies), "p50": percentile(latencies, 0.5),
+                    "p95": percentile(latencies, 0.95), "max": latencies[-1] if latencies else 0.0,
+                    "histogram": dict(zip((str(bound) for bound in LATENCY_BUCKETS), histogram)),
+                }
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "wall": time.perf_counter() - self.start,
+                "endpoints": endpoints,
+                "cache": {"hits": self.cache_hits, "misses": self.cache_misses,
+                          "hit_rate": self.cache_hits / lookups if lookups else None},
+                "stages": {name: dict(stats) for name, stats in self.stages.items()},
+            }
+
+    def summary(self):
+        data = self.to_json()
+        lines = [f"\n### Profile: {data['wall']:.2f} s wall\n",
+                 f"{'endpoint':<10} {'requests':>8} {'errors':>6} {'KB':>9} {'total s':>8} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}"]
+        for name, stats in sorted(data["endpoints"].items()):
+            lines.append(f"{name:<10} {stats['requests']:>8} {stats['errors']:>6} {stats['bytes'] / 1024:>9.0f} "
+                         f"{stats['total']:>8.2f} {stats['p50'] * 1000:>7.1f} {stats['p95'] * 1000:>7.1f} {stats['max'] * 1000:>7.1f}")
+            bars = "  ".join(f"<={bound}s:{count}" for bound, count in stats["histogram"].items() if count)
+            lines.append(f"{'':<10} {bars}")
+        cache = data["cache"]
+        if cache["hit_rate"] is not None:
+            lines.append(f"\ncache      {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%})")
+        lines.append(f"\n{'stage':<30} {'calls':>8} {'total s':>8} {'mean ms':>8}")
+        for name, stats in sorted(data["stages"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{name:<30} {stats['calls']:>8} {stats['total']:>8.2f} {stats['total'] / stats['calls'] * 1000:>8.3f}")
+        return "\n".join(lines)
+
+    def write(self, path, format="json"):
+        with open(path, "w", encoding="utf-8") as f:
+            if format == "chrome":
+                with self.lock:
+                    json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, f)
+            else:
+                json.dump(self.to_json(), f, indent=4)
+        return path
+
+
+def percentile(values, fraction):
+    # values sorted ascending
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Active profiler, None when profiling is off
+profiler = None
+NO_STAGE = nullcontext()
+
+
+def enable():
+    global profiler
+    profiler = Profiler()
+    return profiler
+
+
+def stage(name):
+    if profiler is None:
+        return NO_STAGE
+    return profiler.stage(name)
@@ -0,0 +1,195 @@
+import argparse
+import json
+import re
+import sqlite3
+import time
+
+from folder_index import FolderIndex, isExcludedTitle, getCategory
+from weights import leadingNumber
+
+LABEL_SEPARATORS = re.compile(r'[,;\n]')
+
+
+def splitLabels(value):
+    if not value:
+        return []
+    return [label.strip() for label in LABEL_SEPARATORS.split(value) if label.strip()]
+
+
+def walkFolder(json_in, folder_id, path, folders, items):
+    # Same tree order and obsolete rule as matrix_api.collectItemsFromJson
+    for line in json_in:
+        if line['isFolder'] == 1:
+            if not isExcludedTitle(line['title']):
+                folders.append((line['itemRef'], line['title'], folder_id, path + line['itemRef'] + "/"))
+                walkFolder(line['itemList'], line['itemRef'], path + line['itemRef'] + "/", folders, items)
+        else:
+            items[line['itemRef']] = (folder_id, path, line.get('version'))
+
+
+class Snapshot:
+    """
+    Local SQLite copy of a project: folder tree and exported rows of every crawled root folder,
+    indexed by item ID, type, folder and label so queries and exports need no network.
+    - path: SQLite file
+    """
+    def __init__(self, path="matrix_snapshot.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS roots (id TEXT PRIMARY KEY, title TEXT, refreshed REAL);
+            CREATE TABLE IF NOT EXISTS folders (id TEXT PRIMARY KEY, title TEXT, parent TEXT, root TEXT, path TEXT);
+            CREATE TABLE IF NOT EXISTS items (
+                id TEXT PRIMARY KEY, type TEXT, folder TEXT, root TEXT, position INTEGER,
+                title TEXT, version TEXT, p1 INTEGER, s1 INTEGER, row TEXT);
+            CREATE TABLE IF NOT EXISTS labels (label TEXT, item TEXT, PRIMARY KEY (label, item)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS items_type ON items (type);
+            CREATE INDEX IF NOT EXISTS items_folder ON items (folder);
+            CREATE INDEX IF NOT EXISTS items_root ON items (root, position);
+            CREATE INDEX IF NOT EXISTS labels_item ON labels (item);
+            CREATE INDEX IF NOT EXISTS folders_root ON folders (root);
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def previous(self, root):
+        # Stored rows of a root folder, in the {item ID: {"version", "row"}} form of iterItemsFromJson
+        return {item_id: {'version': json.loads(version), 'row': json.loads(row)}
+                for item_id, version, row in self.conn.execute(
+                    "SELECT id, version, row FROM items WHERE root = ?", (root,))}
+
+    def save(self, root, data_json, rows):
+        """
+        Replace everything stored under root by the folder tree data_json and its rows.
+        - rows: iterable of exported rows (dicts with an 'ID'), consumed while writing
+        """
+        folders = [(root, data_json.get('title', root), None, "/" + root + "/")]
+        items = {}
+        walkFolder(data_json['itemList'], root, folders[0][3], folders, items)
+        with self.conn:
+            self.conn.execute("DELETE FROM labels WHERE item IN (SELECT id FROM items WHERE root = ?)", (root,))
+            self.conn.execute("DELETE FROM items WHERE root = ?", (root,))
+            self.conn.execute("DELETE FROM folders WHERE root = ?", (root,))
+            self.conn.executemany("INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?, ?)",
+                                  [(ref, title, parent, root, path) for ref, title, parent, path in folders])
+            count = 0
+            for position, row in enumerate(rows):
+                item_id = row['ID']
+                folder, _, version = items.get(item_id, (root, None, None))
+                self.conn.execute("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (item_id, getCategory(item_id), folder, root, position, row.get('Title'),
+                                   json.dumps(version), leadingNumber(row.get('P1')), leadingNumber(row.get('S1')),
+                                   json.dumps(row)))
+                self.conn.executemany("INSERT OR IGNORE INTO labels VALUES (?, ?)",
+                                      [(label, item_id) for label in splitLabels(row.get('Labels'))])
+                count += 1
+            self.conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?, ?)", (root, folders[0][1], time.time()))
+        return count
+
+    def folderTitle(self, folder_id):
+        row = self.conn.execute("SELECT title FROM folders WHERE id = ?", (folder_id,)).fetchone()
+        return row[0] if row else None
+
+    def folderIndex(self):
+        # Stored folder tree as a FolderIndex, for titles and paths without the network
+        index = FolderIndex()
+        for ref, title, parent in self.conn.execute("SELECT id, title, parent FROM folders ORDER BY LENGTH(path)"):
+            index.addFolder(ref, title, parent)
+        for item_id, folder in self.conn.execute("SELECT id, folder FROM items"):
+            index.addItem(item_id, folder)
+        return index
+
+    def subfolders(self, folder_id):
+        # folder_id and every folder below it
+        row = self.conn.execute("SELECT path FROM folders WHERE id = ?", (folder_id,)).fetchone()
+        if row is None:
+            return []
+        return [ref for ref, in self.conn.execute("SELECT id FROM folders WHERE path LIKE ?", (row[0] + "%",))]
+
+    def query(self, type=None, folder=None, label=None, ids=None, min_p1=None, min_s1=None, where=None):
+        """
+        Stored rows matching every given filter, in folder tree order.
+        - type: item type ("SRS", "FMEA", ...)
+        - folder: folder ID, items of its sub-folders included
+        - label: one label of the Labels field
+        - ids: item IDs
+        - min_p1 / min_s1: lowest P1 / S1 weight of FMEA items
+        - where: predicate called on each row, for anything else
+        """
+        clauses = []
+        params = []
+        if type is not None:
+            clauses.append("type = ?")
+            params.append(type)
+        if folder is not None:
+            folders = self.subfolders(folder)
+            clauses.append(f"folder IN ({','.join('?' * len(folders))})" if folders else "0")
+            params += folders
+        if label is not None:
+            clauses.append("id IN (SELECT item FROM labels WHERE label = ?)")
+            params.append(label)
+        if ids is not None:
+            ids = list(ids)
+            clauses.append(f"id IN ({','.join('?' * len(ids))})" if ids else "0")
+            params += ids
+        if min_p1 is not None:
+            clauses.append("p1 >= ?")
+            params.append(min_p1)
+        if min_s1 is not None:
+            clauses.append("s1 >= ?")
+            params.append(min_s1)
+        sql = "SELECT row FROM items"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY root, position"
+        for row, in self.conn.execute(sql, params):
+            row = json.loads(row)
+            if where is None or where(row):
+                yield row
+
+    def item(self, item_id):
+        row = self.conn.execute("SELECT row FROM items WHERE id = ?", (item_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def labels(self):
+        # label -> number of items
+        return dict(self.conn.execute("SELECT label, COUNT(*) FROM labels GROUP BY label ORDER BY label"))
+
+    def roots(self):
+        # root folder ID -> (title, last refresh time)
+        return {ref: (title, refreshed) for ref, title, refreshed in self.conn.execute("SELECT * FROM roots")}
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--snapshot", required=False, type=str, default="matrix_snapshot.sqlite", help="Snapshot file, default is \'matrix_snapshot.sqlite\'")
+    parser.add_argument("-f", "--folder_id", required=False, type=str, nargs="*", default=[], help="With --save, root folders to crawl, otherwise only query items below this folder")
+    parser.add_argument("--save", action="store_true", help="Crawl the folders given with -f into the snapshot, unchanged items are not fetched again")
+    parser.add_argument("--full", action="store_true", help="With --save, fetch every item even when unchanged")
+    parser.add_argument("-w", "--workers", required=False, type=int, default=1, help="Number of items fetched in parallel, default is 1")
+    parser.add_argument("--type", required=False, type=str, default=None, help="Only items of this type, e.g. \'SRS\'")
+    parser.add_argument("--label", required=False, type=str, default=None, help="Only items with this label")
+    parser.add_argument("--min_p1", required=False, type=int, default=None, help="Only FMEA items with P1 at least this")
+    parser.add_argument("--min_s1", required=False, type=int, default=None, help="Only FMEA items with S1 at least this")
+    args = parser.parse_args()
+
+    if args.save:
+        import matrix_api as api
+        api.saveSnapshot(args.snapshot, args.folder_id, workers=args.workers, refresh=not args.full)
+        return
+    snapshot = Snapshot(args.snapshot)
+    start = time.perf_counter()
+    rows = list(snapshot.query(type=args.type, folder=args.folder_id[0] if args.folder_id else None,
+                               label=args.label, min_p1=args.min_p1, min_s1=args.min_s1))
+    elapsed = time.perf_counter() - start
+    for row in rows:
+        print(row['ID'] + "  \t" + row.get('Title', ''))
+    print(f"\n{len(rows)} items in {elapsed * 1000:.1f} ms")
+    snapshot.close()
+
+
+if __name__ == '__main__':
+    main()
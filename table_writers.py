@@ -0,0 +1,110 @@
+import csv
+
+
+class BatchWriter:
+    """
+    Base of the streaming table writers: rows are buffered and flushed every `batch_size` rows.
+    - out_path: output file
+    - columns: list of column names, fixed up front (missing keys are written empty)
+    """
+    def __init__(self, out_path, columns, batch_size=1000):
+        self.out_path = str(out_path)
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.batch = []
+
+    def write(self, row):
+        self.writeValues([row.get(col) for col in self.columns])
+
+    def writeValues(self, values):
+        # One row as a list of values in column order (ItemTable.iterValues)
+        self.batch.append(values)
+        if len(self.batch) >= self.batch_size:
+            self.flush(self.batch)
+            self.batch = []
+
+    def flush(self, batch):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def close(self):
+        if self.batch:
+            self.flush(self.batch)
+            self.batch = []
+        self.finish()
+        return self.out_path
+
+
+class CsvWriter(BatchWriter):
+    def __init__(self, out_path, columns, batch_size=1000):
+        super().__init__(out_path, columns, batch_size)
+        self.f = open(self.out_path, "w", encoding="utf-8", newline="")
+        self.csv = csv.writer(self.f)
+        self.csv.writerow(self.columns)
+
+    def flush(self, batch):
+        self.csv.writerows(batch)
+
+    def finish(self):
+        self.f.close()
+
+
+class XlsWriter(BatchWriter):
+    """XLSX through openpyxl write-only mode, rows go straight to the sheet XML."""
+    def __init__(self, out_path, columns, batch_size=1000):
+        from openpyxl import Workbook
+        super().__init__(out_path, columns, batch_size)
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.ws.append(self.columns)
+
+    def flush(self, batch):
+        for values in batch:
+            self.ws.append(values)
+
+    def finish(self):
+        self.wb.save(self.out_path)
+
+
+class ParquetWriter(BatchWriter):
+    """Parquet through pyarrow, one row group per batch, every column stored as string."""
+    def __init__(self, out_path, columns, batch_size=10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        super().__init__(out_path, columns, batch_size)
+        self.pa = pa
+        self.schema = pa.schema([(col, pa.string()) for col in self.columns])
+        self.writer = pq.ParquetWriter(self.out_path, self.schema)
+
+    def flush(self, batch):
+        arrays = [self.pa.array([None if values[c] is None else str(values[c]) for values in batch], self.pa.string())
+                  for c in range(len(self.columns))]
+        self.writer.write_batch(self.pa.record_batch(arrays, schema=self.schema))
+
+    def finish(self):
+        self.writer.close()
+
+
+# --format name -> (writer, file extension)
+def warnUnknownKeys(rows, columns):
+    # Pass the rows through, warning once per key that is not one of the columns (its values are dropped)
+    known = set(columns)
+    for row in rows:
+        if len(known) < len(row) or any(key not in known for key in row):
+            for key in row:
+                if key not in known:
+                    print(f"Warning: column '{key}' is missing from the first rows, its values are not exported")
+                    known.add(key)
+        yield row
+
+
+WRITERS = {
+    "xlsx": (XlsWriter, ".xlsx"),
+    "csv": (CsvWriter, ".csv"),
+    "parquet": (ParquetWriter, ".parquet"),
+}
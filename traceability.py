@@ -0,0 +1,89 @@
+import re
+
+from folder_index import getCategory
+
+req_id_regexp = r"\s*((?:SDD|SRS)[- _,.]*0*\d{1,6})"
+REQ_ID = re.compile(req_id_regexp)
+REQ_PARTS = re.compile(r'(SDD|SRS)\D*(\d+)')
+
+
+def normalize_id(text):
+    # "SRS _012" / "SRS.12" / "SRS-12" -> "SRS-12"
+    match = REQ_PARTS.search(text)
+    if match is None:
+        return text.strip()
+    return f"{match.group(1)}-{int(match.group(2))}"
+
+
+def id_key(item_id):
+    # Natural order: SDD before SRS, SRS-2 before SRS-10
+    prefix, _, number = item_id.partition('-')
+    return (prefix, int(number) if number.isdigit() else 0, item_id)
+
+
+class TraceIndex:
+    """
+    Inverted index of SRS/SDD references, built while rows go by: every text field is scanned
+    once with the precompiled pattern, so building it is linear in the total text size.
+    Feed it every folder of the project that matters (requirements and the items referring to
+    them): a reference is only an orphan when items of its type were scanned, and a requirement
+    only uncovered when items of another type were scanned.
+    - fields: row keys that are scanned for references
+    """
+    def __init__(self, fields=("Description", "Mitigation")):
+        self.fields = fields
+        self.references = {}    # referenced ID -> {referencing item ID: None}, insertion ordered
+        self.items = {}         # exported item ID (normalized) -> item ID
+        self.scanned = {}       # item type ("SRS", "FMEA", ...) -> number of items scanned
+
+    def add(self, row):
+        item_id = row.get('ID')
+        if item_id is None:
+            return
+        own = normalize_id(item_id) if REQ_PARTS.match(item_id) else item_id
+        self.items[own] = item_id
+        kind = getCategory(own)
+        self.scanned[kind] = self.scanned.get(kind, 0) + 1
+        for field in self.fields:
+            text = row.get(field)
+            if not text:
+                continue
+            for match in REQ_ID.finditer(text):
+                ref = normalize_id(match.group(1))
+                if ref != own:
+                    self.references.setdefault(ref, {})[item_id] = None
+
+    def update(self, other):
+        # Merge the index of other rows, e.g. another folder of the same project
+        for ref, items in other.references.items():
+            self.references.setdefault(ref, {}).update(items)
+        self.items.update(other.items)
+        for kind, count in other.scanned.items():
+            self.scanned[kind] = self.scanned.get(kind, 0) + count
+
+    def trace_matrix(self):
+        # One row per referenced ID, with the items referencing it
+        return [{"Requirement": ref, "Referenced by": ", ".join(self.references[ref]),
+                 "Count": len(self.references[ref])}
+                for ref in sorted(self.references, key=id_key)]
+
+    def orphans(self):
+        # Referenced IDs missing from the scanned items of their type (dangling references)
+        return [ref for ref in sorted(self.references, key=id_key)
+                if ref not in self.items and getCategory(ref) in self.scanned]
+
+    def uncovered(self):
+        # Scanned SRS/SDD items that nothing references, when items of another type were scanned
+        return [self.items[ref] for ref in sorted(self.items, key=id_key)
+                if REQ_PARTS.match(ref) and ref not in self.references
+                and any(kind != getCategory(ref) for kind in self.scanned)]
+
+    def unchecked(self):
+        # Referenced types none of whose items were scanned, their references can't be checked
+        return sorted({getCategory(ref) for ref in self.references} - set(self.scanned))
+
+    def issues(self):
+        rows = [{"ID": ref, "Issue": "orphan reference", "Referenced by": ", ".join(self.references[ref])}
+                for ref in self.orphans()]
+        rows += [{"ID": item_id, "Issue": "uncovered", "Referenced by": ""} for item_id in self.uncovered()]
+        return rows
@@ -0,0 +1,48 @@
+# FMEA weights, shared by the exports, the snapshot, the item table and the numpy based fmea module
+import re
+
+LEADING_NUMBER = re.compile(r'\s*(\d+)')
+
+# Default RPN upper bounds of the "Acceptable" and "Review" levels, anything above is "Unacceptable".
+# Set them from the risk acceptability criteria of the project (matrix_export.py --risk_thresholds).
+RISK_THRESHOLDS = (4, 9)
+# Weights of an exported FMEA row: probability and severity before (P1/S1) and after (P2/S2) mitigation
+WEIGHTS = ("P1", "S1", "P2", "S2")
+# Columns of an exported FMEA row that are not weights (matrix_api.fieldColumns, matrix_export.with_path)
+TEXT_COLUMNS = ("ID", "Title", "Path", "item", "failure", "effect", "cause", "Mitigation")
+
+
+def leadingNumber(value):
+    # "4-Possible" -> 4, "3" -> 3, anything else -> None
+    match = LEADING_NUMBER.match(str(value)) if value is not None else None
+    return int(match.group(1)) if match else None
+
+
+def extractWeightsFromFMEA(json_in):
+    """
+    All weights of an FMEA/risk JSON, keyed by weight type (P1, S1, ...): the ones attached
+    to the factors (before mitigation) and the top-level postWeights (after mitigation).
+    A weight without type is keyed by its label, or by its factor and position.
+    """
+    weights = {}
+    for element in json_in.get('factors', []):
+        for i, weight in enumerate(element.get('weights') or []):
+            key = weight.get('type') or weight.get('label') or f"{element['type']}{i + 1}"
+            weights.setdefault(key, weight.get('value'))
+    for i, weight in enumerate(json_in.get('postWeights') or []):
+        key = weight.get('type') or weight.get('label') or f"post{i + 1}"
+        weights.setdefault(key, weight.get('value'))
+    return weights
+
+
+def rowWeights(row):
+    # Weights of an exported FMEA row: WEIGHTS at least, plus every other weight type it carries
+    weights = {key: row.get(key) for key in WEIGHTS}
+    weights.update((key, value) for key, value in row.items() if key not in TEXT_COLUMNS and key not in weights)
+    return weights
+
+
+def weightValue(value):
+    # leadingNumber as a float for numeric columns, nan instead of None
+    number = leadingNumber(value)
+    return float("nan") if number is None else float(number)